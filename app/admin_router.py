@@ -0,0 +1,135 @@
+import secrets
+from contextlib import contextmanager
+from typing import Annotated, List, Union
+
+import numpy as np
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+
+from app.env import APP
+from app.load_data import antennas_store
+from app.logger import logging
+from app.schemas import Antenna, AntennaPatch, StoredAntenna, X, Y
+from app.store import AntennaNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+def _check_token(
+    x_admin_token: Annotated[Union[str, None], Header()] = None,
+) -> None:
+    if not APP.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled, no ADMIN_TOKEN is set",
+        )
+    if not secrets.compare_digest(x_admin_token or "", APP.ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token",
+        )
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(_check_token)])
+
+
+@contextmanager
+def _store_errors():
+    """Turn the errors of the store into HTTP errors."""
+    try:
+        yield
+    except AntennaNotFoundError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)
+        ) from exc
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+        ) from exc
+
+
+@router.get("/antennas", response_model=List[StoredAntenna])
+def search_antennas(
+    x: X,
+    y: Y,
+    radius_km: Annotated[float, Query(gt=0, le=APP.COVERAGE_MAX_KM)] = 1.0,
+    limit: Annotated[int, Query(gt=0)] = 100,
+):
+    """Return the antennas located within `radius_km` kilometers, at most
+    `COVERAGE_MAX_KM`, of the Lambert 93 location (x, y), the closest first.
+    """
+    snapshot = antennas_store.snapshot()
+    radius = radius_km * 1000
+    candidates = snapshot.index.query(x, y, radius)
+    distances = np.hypot(
+        snapshot.x[candidates] - x, snapshot.y[candidates] - y
+    )
+    order = np.argsort(distances)
+    closest = candidates[order][distances[order] <= radius][:limit]
+    return [snapshot.antenna(int(antenna_id)) for antenna_id in closest]
+
+
+@router.get("/antennas/{antenna_id}", response_model=StoredAntenna)
+def get_antenna(antenna_id: int, version: Union[str, None] = None):
+    """Return an antenna as it is in a version of the antennas data. If no
+    version is given, it is the antenna of the default version, or of the
+    last version it was written to if it is not in the default one.
+    """
+    with _store_errors():
+        return antennas_store.get(antenna_id, version)
+
+
+@router.post(
+    "/antennas",
+    response_model=StoredAntenna,
+    status_code=status.HTTP_201_CREATED,
+)
+def insert_antenna(antenna: Antenna, version: Union[str, None] = None):
+    """Add an antenna to a version of the antennas data, the default one if
+    None.
+    """
+    with _store_errors():
+        antenna_id = antennas_store.insert(
+            antenna.model_dump(by_alias=True), version
+        )
+    logger.info("Antenna %s inserted in version %s", antenna_id, version)
+    return antennas_store.get(antenna_id, version)
+
+
+@router.patch("/antennas/{antenna_id}", response_model=StoredAntenna)
+def update_antenna(
+    antenna_id: int, changes: AntennaPatch, version: Union[str, None] = None
+):
+    """Change some fields of an antenna in a version of the antennas data, the
+    default one if None. The antenna is unchanged in the other versions.
+
+    The antenna keeps its id.
+    """
+    with _store_errors():
+        antennas_store.update(
+            antenna_id,
+            changes.model_dump(by_alias=True, exclude_unset=True),
+            version,
+        )
+    logger.info("Antenna %s updated in version %s", antenna_id, version)
+    return antennas_store.get(antenna_id, version)
+
+
+@router.delete(
+    "/antennas/{antenna_id}", status_code=status.HTTP_204_NO_CONTENT
+)
+def remove_antenna(antenna_id: int, version: Union[str, None] = None):
+    """Remove an antenna from a version of the antennas data, the default one
+    if None. The antenna is kept in the other versions.
+    """
+    with _store_errors():
+        antennas_store.remove(antenna_id, version)
+    logger.info("Antenna %s removed from version %s", antenna_id, version)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
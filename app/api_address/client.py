@@ -1,34 +1,96 @@
-from typing import Tuple
+import time
+from http import HTTPStatus
+from typing import Any, Dict, Tuple, Union
 
-from requests import Request, Session
+from requests import Request, Response, Session
 
+from app.api_address.rate_limiter import RateLimiter, rate_limiter
 from app.env import APP
-from app.logger import logging
+from app.geocoder.base import Geocoder
+from app.logger import add_stage_time, log_details, logging
 
 logger = logging.getLogger(__name__)
 
 
-class APIAddressClient:
-    def __init__(self, url: str = APP.API_ADDRESS_URL):
+class APIAddressClient(Geocoder):
+    def __init__(
+        self,
+        url: str = APP.API_ADDRESS_URL,
+        rate_limiter: RateLimiter = rate_limiter,
+        max_retries: int = APP.API_ADDRESS_MAX_RETRIES,
+    ):
         self.session = Session()
         self.url = url
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
 
     def get_xy_from_address(self, address: str) -> Tuple[float, float]:
-        logger.info("Searching for address: %s", address)
+        properties = self._search(address)
+        if properties is None:
+            return None, None
+        return properties["x"], properties["y"]
+
+    def get_xy_and_citycode_from_address(
+        self, address: str
+    ) -> Tuple[float, float, Union[str, None]]:
+        properties = self._search(address)
+        if properties is None:
+            return None, None, None
+        return properties["x"], properties["y"], properties.get("citycode")
+
+    def _search(self, address: str) -> Union[Dict[str, Any], None]:
+        """Return the properties (label, x, y, citycode, postcode...) of the
+        best match of an address, or None if the address is not found."""
+        if log_details():
+            logger.info("Searching for address: %s", address)
 
         request = Request(
             "GET", f"{self.url}/search/", params={"q": address, "limit": 1}
         )
         prepared_request = self.session.prepare_request(request)
-        response = self.session.send(prepared_request)
+        response = self._send(prepared_request)
+        if response is None:
+            logger.warning("Address API kept throttling for: %s", address)
+            return None
         data = response.json()
 
         if len(data["features"]) == 0:
-            logger.info("No address found for: %s", address)
-            return None, None
+            if log_details():
+                logger.info("No address found for: %s", address)
+            return None
 
         properties = data["features"][0]["properties"]
-        logger.info("Corresponding address found: %s", properties["label"])
-        x = properties["x"]
-        y = properties["y"]
-        return x, y
+        if log_details():
+            logger.info("Corresponding address found: %s", properties["label"])
+        return properties
+
+    def _send(self, prepared_request) -> Union[Response, None]:
+        """Send a request through the shared rate limiter, retrying when the
+        server answers with a 429 (Too Many Requests).
+
+        Returns
+        -------
+        Union[Response, None]
+            The response of the server, or None if it was still throttled
+            after `max_retries` retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            with self.rate_limiter.slot() as slot:
+                add_stage_time("address_api_queue", slot.wait)
+                response = self.session.send(prepared_request)
+                slot.throttled = (
+                    response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+                )
+            if not slot.throttled:
+                return response
+            if attempt < self.max_retries:
+                time.sleep(self._retry_after(response))
+        return None
+
+    @staticmethod
+    def _retry_after(response: Response) -> float:
+        """Number of seconds to wait before retrying a throttled request."""
+        try:
+            return float(response.headers.get("Retry-After", 1))
+        except (TypeError, ValueError):
+            return 1.0
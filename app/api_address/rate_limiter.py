@@ -0,0 +1,263 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from app.env import APP
+from app.logger import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket pacing requests at a steady rate.
+
+    Tokens are reserved rather than polled: a caller that finds the bucket
+    empty takes a token "on credit" and sleeps exactly until it would have
+    been refilled. Callers are therefore served in arrival order and the
+    request rate never exceeds `rate` after the initial `capacity` burst.
+
+    Parameters
+    ----------
+    rate : float
+        The number of tokens added to the bucket per second.
+    capacity : float
+        The maximum number of tokens the bucket can hold, i.e. the largest
+        burst allowed after an idle period.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1, got {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token from the bucket, sleeping if none is available.
+
+        Returns
+        -------
+        float
+            The number of seconds spent waiting for the token.
+        """
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._updated_at
+            self._tokens = min(
+                self.capacity, self._tokens + elapsed * self.rate
+            )
+            self._updated_at = now
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class AdaptiveConcurrencyLimiter:
+    """Bound the number of in-flight requests with an AIMD policy.
+
+    The limit grows additively (by one slot per window of successful
+    requests) and is cut multiplicatively whenever the server throttles us,
+    so it settles just below the concurrency the server accepts.
+
+    The limit is cut once per congestion event: the requests in flight when
+    it is cut were sent under the former limit, so their 429 responses are
+    ignored until as many requests have completed.
+
+    Parameters
+    ----------
+    initial : int
+        The starting concurrency limit.
+    minimum : int
+        The lowest value the limit can be decreased to.
+    maximum : int
+        The highest value the limit can be increased to.
+    decrease_factor : float
+        The factor applied to the limit on a throttled response.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        decrease_factor: float = 0.5,
+    ):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError(
+                "Concurrency limits must satisfy "
+                f"1 <= minimum ({minimum}) <= initial ({initial}) "
+                f"<= maximum ({maximum})"
+            )
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self._limit = float(initial)
+        self._in_flight = 0
+        # Number of completions left before a 429 cuts the limit again
+        self._recovering = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        """Wait for a free slot and take it.
+
+        Returns
+        -------
+        float
+            The number of seconds spent waiting for the slot.
+        """
+        start = time.monotonic()
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return time.monotonic() - start
+
+    def release(self, throttled: bool = False) -> None:
+        """Give a slot back and adapt the limit to the request outcome.
+
+        Parameters
+        ----------
+        throttled : bool
+            Whether the server answered with a 429 (Too Many Requests).
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if throttled and not self._recovering:
+                self._limit = max(
+                    self.minimum, self._limit * self.decrease_factor
+                )
+                self._recovering = self._in_flight
+                logger.warning(
+                    "Throttled by the server, concurrency limit set to %s",
+                    self.limit,
+                )
+            else:
+                self._recovering = max(0, self._recovering - 1)
+                if not throttled:
+                    self._limit = min(
+                        self.maximum, self._limit + 1 / self._limit
+                    )
+            self._condition.notify_all()
+
+
+@dataclass
+class QueueStats:
+    """Cumulated time spent by requests waiting in the rate limiter queue."""
+
+    requests: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+@dataclass
+class Slot:
+    """Handle yielded by `RateLimiter.slot` for one request."""
+
+    wait: float
+    throttled: bool = False
+
+
+class RateLimiter:
+    """Rate limiter combining a token bucket with adaptive concurrency.
+
+    A single instance is meant to be shared by every request sent from a
+    worker so that the whole worker stays just under the server quota.
+
+    Parameters
+    ----------
+    rate : float
+        The maximum number of requests per second.
+    burst : int
+        The maximum number of requests sent at once after an idle period.
+    initial_concurrency : int
+        The starting number of concurrent requests allowed.
+    min_concurrency : int
+        The lowest number of concurrent requests allowed.
+    max_concurrency : int
+        The highest number of concurrent requests allowed.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        initial_concurrency: int,
+        min_concurrency: int,
+        max_concurrency: int,
+    ):
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=initial_concurrency,
+            minimum=min_concurrency,
+            maximum=max_concurrency,
+        )
+        self.stats = QueueStats()
+        self._stats_lock = threading.Lock()
+
+    @contextmanager
+    def slot(self) -> Iterator[Slot]:
+        """Wait for the right to send one request.
+
+        The caller must set `throttled` on the yielded slot when the server
+        answered with a 429 so that the concurrency limit is decreased.
+
+        Yields
+        ------
+        Slot
+            The slot, holding the time waited in the queue.
+        """
+        wait = self.concurrency.acquire()
+        try:
+            wait += self.bucket.acquire()
+        except BaseException:
+            self.concurrency.release()
+            raise
+
+        with self._stats_lock:
+            self.stats.requests += 1
+            self.stats.total_wait += wait
+            self.stats.max_wait = max(self.stats.max_wait, wait)
+        logger.debug("Request waited %.3fs in the rate limiter queue", wait)
+
+        slot = Slot(wait=wait)
+        try:
+            yield slot
+        finally:
+            self.concurrency.release(throttled=slot.throttled)
+
+
+rate_limiter = RateLimiter(
+    rate=APP.API_ADDRESS_RATE_LIMIT,
+    burst=APP.API_ADDRESS_BURST,
+    initial_concurrency=APP.API_ADDRESS_MAX_CONCURRENCY,
+    min_concurrency=APP.API_ADDRESS_MIN_CONCURRENCY,
+    max_concurrency=APP.API_ADDRESS_MAX_CONCURRENCY,
+)
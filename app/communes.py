@@ -0,0 +1,391 @@
+import argparse
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from app.env import APP
+from app.geocoder.factory import get_geocoder
+from app.logger import log_details, logging, stage
+from app.radius import DEFAULT_MODEL, RadiusModel, radius_models
+from app.services import CoverageQuery, coverage, coverage_batch
+from app.store import (
+    GENERATIONS,
+    OPERATORS,
+    AntennaStore,
+    LiveAntennaStore,
+)
+
+logger = logging.getLogger(__name__)
+
+CODES_FILE = "codes.npy"
+COVERAGE_FILE = "coverage.npy"
+X_FILE = "x.npy"
+Y_FILE = "y.npy"
+METADATA_FILE = "metadata.json"
+
+# INSEE commune codes have 5 characters, e.g. "75056" or "2A004"
+CITYCODE_DTYPE = "S5"
+
+# The address API gives the INSEE code of the municipal arrondissement of the
+# addresses of Paris, Lyon and Marseille, not the one of their commune
+MUNICIPAL_ARRONDISSEMENTS: Dict[str, str] = {
+    **{str(code): "75056" for code in range(75101, 75121)},
+    **{str(code): "69123" for code in range(69381, 69390)},
+    **{str(code): "13055" for code in range(13201, 13217)},
+}
+
+
+def coverage_bit(operator_index: int, generation_index: int) -> int:
+    """Return the bit of the coverage of an operator for a generation in the
+    coverage masks of the communes."""
+    return 1 << (operator_index * len(GENERATIONS) + generation_index)
+
+
+def coverage_masks(
+    x: np.ndarray,
+    y: np.ndarray,
+    antennas_store: AntennaStore,
+    version: Union[str, None],
+    radius_model: Union[RadiusModel, None],
+) -> np.ndarray:
+    """Return the coverage mask of locations for all the operators and
+    generations, see `coverage_bit` (uint16)."""
+    covered = coverage_batch(
+        x,
+        y,
+        antennas_store,
+        CoverageQuery(
+            GENERATIONS, OPERATORS, version=version, radius_model=radius_model
+        ),
+    )
+    masks = np.zeros(len(x), dtype=np.uint16)
+    for i in range(len(OPERATORS)):
+        for j in range(len(GENERATIONS)):
+            masks |= covered[:, i, j] * np.uint16(coverage_bit(i, j))
+    return masks
+
+
+def build_commune_table(
+    centroids_path: str,
+    table_path: str,
+    antennas_store: AntennaStore,
+    version: Union[str, None] = None,
+    radius_model: Union[RadiusModel, None] = None,
+) -> None:
+    """Build the on-disk table of the coverage of each commune.
+
+    The coverage of a commune is the coverage at its centroid, or at any
+    representative point given in the CSV file, computed for all the
+    operators and generations.
+
+    The table is a directory loaded memory mapped by `CommuneCoverageTable`:
+    - `codes.npy`: the sorted INSEE codes of the communes.
+    - `coverage.npy`: the coverage mask of each commune, see `coverage_bit`
+      (uint16).
+    - `x.npy` and `y.npy`: the coordinates of the centroid of each commune,
+      to update their coverage with the antennas (float64).
+    - `metadata.json`: the version of the antennas data and the radius model
+      the table was built with.
+
+    Parameters
+    ----------
+    centroids_path : str
+        The path to the CSV file of the communes, with a "code_insee" column
+        and the Lambert 93 coordinates of their centroid in "x" and "y".
+    table_path : str
+        The path to the directory to write the table to.
+    antennas_store : AntennaStore
+        The store of antennas.
+    version : Union[str, None]
+        The version of the antennas data to use, the default one if None.
+    radius_model : Union[RadiusModel, None]
+        The coverage radii of the antennas, the default model if None.
+    """
+    logger.info("Building commune coverage table from: %s", centroids_path)
+    communes_df = (
+        pd.read_csv(centroids_path, dtype={"code_insee": str})
+        .dropna(subset=["code_insee", "x", "y"])
+        .drop_duplicates(subset="code_insee")
+        .sort_values("code_insee")
+    )
+
+    x = communes_df["x"].to_numpy(dtype=np.float64)
+    y = communes_df["y"].to_numpy(dtype=np.float64)
+    masks = coverage_masks(x, y, antennas_store, version, radius_model)
+
+    os.makedirs(table_path, exist_ok=True)
+    np.save(
+        os.path.join(table_path, CODES_FILE),
+        communes_df["code_insee"].to_numpy(dtype=CITYCODE_DTYPE),
+    )
+    np.save(os.path.join(table_path, COVERAGE_FILE), masks)
+    np.save(os.path.join(table_path, X_FILE), x)
+    np.save(os.path.join(table_path, Y_FILE), y)
+    with open(os.path.join(table_path, METADATA_FILE), "w") as file:
+        json.dump(
+            {
+                "version": version or antennas_store.default_version,
+                "model": (
+                    radius_model.name if radius_model else DEFAULT_MODEL
+                ),
+                "communes": len(communes_df),
+            },
+            file,
+        )
+    logger.info(
+        "Commune coverage table of %s communes written to: %s",
+        len(communes_df),
+        table_path,
+    )
+
+
+class CommuneCoverageTable:
+    """Coverage of each commune, read from the table built by
+    `build_commune_table`.
+
+    The table is built from the antennas as they are loaded. Once it is
+    subscribed to the updates of a `LiveAntennaStore`, the coverage of the
+    communes in range of each antenna changed is recomputed, see `update`.
+    The masks are copied on write, so a reader never sees an update half
+    applied.
+
+    Parameters
+    ----------
+    table_path : str
+        The path to the directory of the table.
+
+    Raises
+    ------
+    ValueError
+        If the table has no centroids, being built before they were stored
+    """
+
+    def __init__(self, table_path: str = APP.COMMUNE_TABLE_PATH):
+        logger.info("Loading commune coverage table from: %s", table_path)
+        if not os.path.exists(os.path.join(table_path, X_FILE)):
+            raise ValueError(
+                f"Commune coverage table {table_path} has no centroids, "
+                "rebuild it"
+            )
+        self.codes = np.load(
+            os.path.join(table_path, CODES_FILE), mmap_mode="r"
+        )
+        self.masks = np.load(
+            os.path.join(table_path, COVERAGE_FILE), mmap_mode="r"
+        )
+        self.x = np.load(os.path.join(table_path, X_FILE), mmap_mode="r")
+        self.y = np.load(os.path.join(table_path, Y_FILE), mmap_mode="r")
+        with open(os.path.join(table_path, METADATA_FILE)) as file:
+            metadata = json.load(file)
+        self.version: str = metadata["version"]
+        self.model: str = metadata["model"]
+        # The generation of the antenna store the masks are up to date with
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def coverage(
+        self, citycode: str
+    ) -> Union[Dict[str, Dict[str, bool]], None]:
+        """Return the coverage of the antennas in a commune for all the
+        operators and generations, in the format of `services.coverage`, or
+        None if the commune is not in the table.
+
+        The coverage of a municipal arrondissement is its own if it is in the
+        table, else the one of its commune."""
+        i = self._find(citycode)
+        if i is None and citycode in MUNICIPAL_ARRONDISSEMENTS:
+            i = self._find(MUNICIPAL_ARRONDISSEMENTS[citycode])
+        if i is None:
+            return None
+
+        mask = int(self.masks[i])
+        return {
+            operator.value: {
+                generation.value: bool(mask & coverage_bit(op, gen))
+                for gen, generation in enumerate(GENERATIONS)
+            }
+            for op, operator in enumerate(OPERATORS)
+        }
+
+    def update(
+        self, antennas_store: AntennaStore, rows: Union[np.ndarray, None]
+    ) -> None:
+        """Recompute the coverage of the communes in range of antennas added
+        to or removed from the store, as a listener of
+        `LiveAntennaStore.subscribe`.
+
+        Parameters
+        ----------
+        antennas_store : AntennaStore
+            The store of antennas after the update.
+        rows : Union[np.ndarray, None]
+            The rows of the antennas added and removed, or None to recompute
+            the coverage of all the communes, as done when an earlier update
+            was not applied.
+        """
+        radius_model = radius_models[self.model]
+        if self.generation != antennas_store.generation - 1:
+            # An earlier update was not applied
+            rows = None
+        if rows is None:
+            communes = np.arange(len(self))
+        else:
+            version_bit = antennas_store.version_bit(self.version)
+            rows = rows[antennas_store.membership[rows] & version_bit != 0]
+            max_radius = max(
+                radius_model.max_radius(generation)
+                for generation in GENERATIONS
+            )
+            in_range = np.zeros(len(self), dtype=bool)
+            for x, y in zip(
+                antennas_store.x[rows].tolist(),
+                antennas_store.y[rows].tolist(),
+                strict=True,
+            ):
+                in_range |= np.hypot(self.x - x, self.y - y) <= max_radius
+            communes = np.flatnonzero(in_range)
+
+        if len(communes):
+            masks = np.array(self.masks)
+            masks[communes] = coverage_masks(
+                self.x[communes],
+                self.y[communes],
+                antennas_store,
+                self.version,
+                radius_model,
+            )
+            self.masks = masks
+        self.generation = antennas_store.generation
+        logger.info(
+            "Commune coverage of %s communes updated to generation %s",
+            len(communes),
+            self.generation,
+        )
+
+    def _find(self, citycode: str) -> Union[int, None]:
+        """Return the index of a commune in the table, or None."""
+        key = citycode.encode()
+        i = int(np.searchsorted(self.codes, key))
+        if i == len(self.codes) or self.codes[i] != key:
+            return None
+        return i
+
+
+def get_commune_coverage_from_address(
+    address: str,
+    commune_table: CommuneCoverageTable,
+    antennas_store: AntennaStore,
+    query: CoverageQuery,
+) -> Union[Dict[str, Dict[str, bool]], None]:
+    """Given an address and the commune coverage table, return the coverage
+    of the antennas in the commune of the address, without looking up any
+    antenna.
+
+    The address is geocoded once. If its commune is unknown or not in the
+    table, the coverage at the address itself is returned instead, see
+    `services.coverage`.
+
+    Parameters
+    ----------
+    address : str
+        The address to check the coverage.
+    commune_table : CommuneCoverageTable
+        The coverage of each commune.
+    antennas_store : AntennaStore
+        The store of antennas, for the communes missing from the table.
+    query : CoverageQuery
+        The version and radius model the table is built with, for the
+        communes missing from the table.
+
+    Returns
+    -------
+    Union[Dict[str, Dict[str, bool]], None]
+        The coverage of the antennas in the commune for all the operators and
+        generations, see `services.coverage`. If the address is not found,
+        return None.
+    """
+    with stage("geocoding"):
+        x, y, citycode = get_geocoder().get_xy_and_citycode_from_address(
+            address
+        )
+    if x is None or y is None:
+        return None
+
+    if citycode is not None:
+        with stage("coverage"):
+            commune_coverage = commune_table.coverage(citycode)
+        if commune_coverage is not None:
+            return commune_coverage
+
+    if log_details():
+        logger.info(
+            "Commune %s not in the commune coverage table, "
+            "checking the coverage at the address",
+            citycode,
+        )
+    with stage("coverage"):
+        return coverage(x, y, antennas_store, query)
+
+
+def get_commune_table(
+    antennas_store: LiveAntennaStore,
+) -> Union[CommuneCoverageTable, None]:
+    """Return the commune coverage table at `COMMUNE_TABLE_PATH`, shared by
+    all the requests of the worker and kept up to date with the updates of
+    the store of antennas, or None if it is not built yet, in which case it
+    is looked for again on the next call."""
+    # The metadata is the last file written by `build_commune_table`
+    if not os.path.exists(os.path.join(APP.COMMUNE_TABLE_PATH, METADATA_FILE)):
+        logger.warning(
+            "No commune coverage table found at: %s", APP.COMMUNE_TABLE_PATH
+        )
+        return None
+    return _load_commune_table(antennas_store)
+
+
+@lru_cache(maxsize=1)
+def _load_commune_table(
+    antennas_store: LiveAntennaStore,
+) -> CommuneCoverageTable:
+    commune_table = CommuneCoverageTable(APP.COMMUNE_TABLE_PATH)
+    antennas_store.subscribe(commune_table.update)
+    return commune_table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Build the coverage table of the communes from their centroids."
+        )
+    )
+    parser.add_argument(
+        "centroids_path",
+        help="Path to the CSV file of the code_insee, x and y of communes.",
+    )
+    parser.add_argument(
+        "table_path",
+        nargs="?",
+        default=APP.COMMUNE_TABLE_PATH,
+        help="Path to the table directory to write.",
+    )
+    parser.add_argument("--version", help="Version of the antennas data.")
+    parser.add_argument(
+        "--model", default=DEFAULT_MODEL, help="Name of the radius model."
+    )
+    args = parser.parse_args()
+
+    from app.load_data import antennas_store
+
+    build_commune_table(
+        args.centroids_path,
+        args.table_path,
+        antennas_store.snapshot(),
+        args.version,
+        radius_models[args.model],
+    )
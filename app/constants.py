@@ -7,14 +7,6 @@ class Generation(StrEnum):
     THREE_G = "3G"
     FOUR_G = "4G"
 
-    @property
-    def km_coverage(self) -> int:
-        return {
-            Generation.TWO_G: 30,
-            Generation.THREE_G: 5,
-            Generation.FOUR_G: 10,
-        }[self]
-
 
 @unique
 class Operator(StrEnum):
@@ -30,4 +22,26 @@ class Columns(StrEnum):
     GEOMETRY = "geometry"
 
 
+@unique
+class GeocoderBackend(StrEnum):
+    API = "api"
+    BAN = "ban"
+
+
+@unique
+class Granularity(StrEnum):
+    ADDRESS = "address"
+    COMMUNE = "commune"
+
+
+@unique
+class LogFormat(StrEnum):
+    JSON = "json"
+    TEXT = "text"
+
+
 PROJECTED_COORDINATE_SYSTEM = "EPSG:2154"
+
+# Lambert 93 bounds of metropolitan France, including Corsica and the coast
+# (xmin, ymin, xmax, ymax), in meters
+METROPOLITAN_BOUNDS = (-378_306, 6_005_281, 1_320_650, 7_235_613)
@@ -16,11 +16,71 @@ except FileNotFoundError:
 @dataclass(repr=False, eq=False, frozen=True)
 class APP:
     LOG_LEVEL: str = config("LOG_LEVEL", default="INFO", cast=str)
+    # "json" for one JSON object per line, or "text"
+    LOG_FORMAT: str = config("LOG_FORMAT", default="json", cast=str)
+    # Share of the requests whose per address detail lines are logged
+    LOG_DETAIL_SAMPLE_RATE: float = config(
+        "LOG_DETAIL_SAMPLE_RATE", default=0.01, cast=float
+    )
     ANTENNAS_DATA_PATH: str = config(
         "ANTENNAS_DATA_PATH",
         default="resources/2018_01_Sites_mobiles_2G_3G_4G_France_metropolitaine_L93_ver2.csv",
         cast=str,
     )
+    # Several versions of the antennas data, as "<version>=<path>" pairs
+    # separated by commas, from the oldest to the default one. Defaults to
+    # the single ANTENNAS_DATA_PATH file.
+    ANTENNAS_DATASETS: str = config("ANTENNAS_DATASETS", default="", cast=str)
+    # Number of rows of the antennas CSV files parsed at once, 0 to parse
+    # them in one go. Set it to load files too large for memory.
+    ANTENNAS_CHUNK_ROWS: int = config(
+        "ANTENNAS_CHUNK_ROWS", default=0, cast=int
+    )
+    SPATIAL_INDEX_CELL_KM: float = config(
+        "SPATIAL_INDEX_CELL_KM", default=10.0, cast=float
+    )
+    # Default coverage radius of each generation, in kilometers
+    COVERAGE_RADII_KM: str = config(
+        "COVERAGE_RADII_KM", default="2G=30,3G=5,4G=10", cast=str
+    )
+    # Largest coverage radius a model can use, in kilometers
+    COVERAGE_MAX_KM: float = config(
+        "COVERAGE_MAX_KM", default=30.0, cast=float
+    )
+    # JSON file describing alternative coverage radius models
+    COVERAGE_MODELS_PATH: str = config(
+        "COVERAGE_MODELS_PATH", default="", cast=str
+    )
     API_ADDRESS_URL: str = config(
         "API_ADDRESS_URL", default="https://api-adresse.data.gouv.fr", cast=str
     )
+    # The address API allows 50 requests per second and per IP, stay under it
+    API_ADDRESS_RATE_LIMIT: float = config(
+        "API_ADDRESS_RATE_LIMIT", default=45.0, cast=float
+    )
+    API_ADDRESS_BURST: int = config("API_ADDRESS_BURST", default=5, cast=int)
+    API_ADDRESS_MIN_CONCURRENCY: int = config(
+        "API_ADDRESS_MIN_CONCURRENCY", default=1, cast=int
+    )
+    API_ADDRESS_MAX_CONCURRENCY: int = config(
+        "API_ADDRESS_MAX_CONCURRENCY", default=10, cast=int
+    )
+    API_ADDRESS_MAX_RETRIES: int = config(
+        "API_ADDRESS_MAX_RETRIES", default=3, cast=int
+    )
+    # Geocoder backend: "api" for the address API only, "ban" for the local
+    # BAN index falling back to the address API on a miss
+    GEOCODER: str = config("GEOCODER", default="api", cast=str)
+    BAN_INDEX_PATH: str = config(
+        "BAN_INDEX_PATH", default="resources/ban_index", cast=str
+    )
+    BAN_FUZZY_CUTOFF: float = config(
+        "BAN_FUZZY_CUTOFF", default=0.8, cast=float
+    )
+    # Directory of the commune coverage table, see app/communes.py
+    COMMUNE_TABLE_PATH: str = config(
+        "COMMUNE_TABLE_PATH", default="resources/commune_coverage", cast=str
+    )
+    # Token required in the X-Admin-Token header of the admin endpoints, which
+    # are disabled if empty
+    ADMIN_TOKEN: str = config("ADMIN_TOKEN", default="", cast=str)
@@ -0,0 +1,377 @@
+import argparse
+import difflib
+import os
+import re
+import unicodedata
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.env import APP
+from app.geocoder.base import Geocoder
+from app.logger import logging
+
+logger = logging.getLogger(__name__)
+
+STREETS_FILE = "streets.npy"
+OFFSETS_FILE = "offsets.npy"
+ADDRESSES_FILE = "addresses.npy"
+CITIES_FILE = "cities.npy"
+
+# Coordinates are stored in centimeters, the precision of the BAN extract,
+# which fits metropolitan Lambert 93 coordinates in 32 bits integers
+COORDINATES_SCALE = 100
+
+ADDRESS_DTYPE = np.dtype([("number", "S12"), ("x", "i4"), ("y", "i4")])
+
+ABBREVIATIONS = {
+    "all": "allee",
+    "av": "avenue",
+    "ave": "avenue",
+    "bd": "boulevard",
+    "bld": "boulevard",
+    "bvd": "boulevard",
+    "ch": "chemin",
+    "che": "chemin",
+    "chem": "chemin",
+    "crs": "cours",
+    "fbg": "faubourg",
+    "fg": "faubourg",
+    "imp": "impasse",
+    "pl": "place",
+    "qu": "quai",
+    "r": "rue",
+    "res": "residence",
+    "rte": "route",
+    "sq": "square",
+    "st": "saint",
+    "ste": "sainte",
+}
+
+POSTCODE_PATTERN = re.compile(r"\b(\d{5})\b")
+NUMBER_PATTERN = re.compile(
+    r"^(\d+)(?:\s*(bis|ter|quater|quinquies)\b|([a-z])\b)?\s*"
+)
+HOUSE_NUMBER_PATTERN = re.compile(rb"^\d+")
+
+
+def normalize(text: str) -> str:
+    """Normalize a piece of address so that spelling variants of the same
+    address compare equal: accents, case, punctuation and common street type
+    abbreviations are removed.
+
+    Example: "Bd de l'Hôpital" -> "boulevard de l hopital"
+    """
+    text = text.lower().replace("œ", "oe").replace("æ", "ae")
+    text = unicodedata.normalize("NFKD", text)
+    text = text.encode("ascii", "ignore").decode("ascii")
+    tokens = re.sub(r"[^a-z0-9]+", " ", text).split()
+    return " ".join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def parse_address(
+    address: str,
+) -> Union[Tuple[str, str, str], Tuple[None, None, None]]:
+    """Split a free text address into its postcode, normalized street and
+    house number.
+
+    Example: "8 bis Bd du Port, 80000 Amiens"
+        -> ("80000", "boulevard du port", "8bis")
+
+    Returns
+    -------
+    Union[Tuple[str, str, str], Tuple[None, None, None]]
+        The postcode, the street and the house number (an empty string if the
+        address has no house number), or None values if the address has no
+        postcode.
+    """
+    text = normalize(address)
+    postcodes = list(POSTCODE_PATTERN.finditer(text))
+    if not postcodes:
+        return None, None, None
+    # The city name follows the postcode, the street precedes it
+    postcode = postcodes[-1]
+    street = text[: postcode.start()].strip()
+
+    number = ""
+    match = NUMBER_PATTERN.match(street)
+    if match:
+        number = match.group(1) + (match.group(2) or match.group(3) or "")
+        street = street[match.end() :]
+    return postcode.group(1), street, number
+
+
+def parse_city(address: str) -> str:
+    """Return the normalized city name following the postcode of a free text
+    address, or an empty string if there is none.
+
+    Example: "8 bis Bd du Port, 80000 Amiens" -> "amiens"
+    """
+    text = normalize(address)
+    postcodes = list(POSTCODE_PATTERN.finditer(text))
+    if not postcodes:
+        return ""
+    return text[postcodes[-1].end() :].strip()
+
+
+def build_ban_index(
+    csv_path: str, index_path: str, chunksize: int = 1_000_000
+) -> None:
+    """Build the on-disk index of a Base Adresse Nationale CSV extract
+    (https://adresse.data.gouv.fr/data/ban/adresses/latest/csv).
+
+    The index is a directory holding four numpy arrays, loaded memory mapped
+    by `BANGeocoder`:
+    - `streets.npy`: the sorted "<postcode>|<normalized street>|<INSEE code>"
+      keys. Streets with the same name in communes sharing a postcode are
+      kept apart by the INSEE code of their commune.
+    - `addresses.npy`: the house numbers and Lambert 93 coordinates (in
+      centimeters) of the addresses, sorted by street and number.
+    - `offsets.npy`: the addresses of the i-th street are the ones between
+      the i-th and the (i+1)-th offsets.
+    - `cities.npy`: the normalized name of the commune of each street.
+
+    Parameters
+    ----------
+    csv_path : str
+        The path to the BAN CSV extract.
+    index_path : str
+        The path to the directory to write the index to.
+    chunksize : int
+        The number of rows of the CSV file read at once.
+    """
+    logger.info("Building BAN index from: %s", csv_path)
+
+    chunks = []
+    for raw_chunk in pd.read_csv(
+        csv_path,
+        sep=";",
+        usecols=[
+            "numero",
+            "rep",
+            "nom_voie",
+            "code_postal",
+            "code_insee",
+            "nom_commune",
+            "x",
+            "y",
+        ],
+        dtype={
+            "numero": str,
+            "rep": str,
+            "code_postal": str,
+            "code_insee": str,
+            "nom_commune": str,
+        },
+        chunksize=chunksize,
+    ):
+        chunk = raw_chunk.dropna(subset=["nom_voie", "code_postal", "x", "y"])
+        # Street names repeat a lot: normalize each of them only once
+        streets = chunk["nom_voie"].astype("category")
+        streets = streets.cat.rename_categories(
+            [normalize(name) for name in streets.cat.categories]
+        )
+        cities = chunk["nom_commune"].fillna("").astype("category")
+        cities = cities.cat.rename_categories(
+            [normalize(name) for name in cities.cat.categories]
+        )
+        chunks.append(
+            pd.DataFrame(
+                {
+                    "street": chunk["code_postal"]
+                    + "|"
+                    + streets.astype(str)
+                    + "|"
+                    + chunk["code_insee"].fillna(""),
+                    "number": chunk["numero"].fillna("")
+                    + chunk["rep"].fillna("").str.lower(),
+                    "x": (chunk["x"] * COORDINATES_SCALE).round(),
+                    "y": (chunk["y"] * COORDINATES_SCALE).round(),
+                    "city": cities.astype(str),
+                }
+            )
+        )
+    ban_df = pd.concat(chunks, ignore_index=True)
+
+    street_ids, streets = pd.factorize(ban_df["street"], sort=True)
+    addresses = np.empty(len(ban_df), dtype=ADDRESS_DTYPE)
+    addresses["number"] = ban_df["number"].to_numpy(dtype="S12")
+    addresses["x"] = ban_df["x"].to_numpy()
+    addresses["y"] = ban_df["y"].to_numpy()
+    addresses = addresses[np.lexsort((addresses["number"], street_ids))]
+    offsets = np.zeros(len(streets) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(street_ids, minlength=len(streets)))
+    cities = ban_df["city"].groupby(street_ids).first()
+
+    os.makedirs(index_path, exist_ok=True)
+    np.save(
+        os.path.join(index_path, STREETS_FILE), streets.to_numpy(dtype="S")
+    )
+    np.save(os.path.join(index_path, OFFSETS_FILE), offsets)
+    np.save(os.path.join(index_path, ADDRESSES_FILE), addresses)
+    np.save(os.path.join(index_path, CITIES_FILE), cities.to_numpy(dtype="S"))
+    logger.info(
+        "BAN index built in %s: %s streets, %s addresses",
+        index_path,
+        len(streets),
+        len(addresses),
+    )
+
+
+class BANGeocoder(Geocoder):
+    """Geocoder answering from a local index of a Base Adresse Nationale
+    extract, built with `build_ban_index`.
+
+    An address is first looked up exactly by postcode, street and house
+    number. On a miss, the closest street of the postcode is picked by fuzzy
+    matching and the closest house number of the street is returned, or the
+    middle of the street if the address has no house number.
+
+    When communes sharing the postcode have a street of this name, the
+    commune is picked by the city name of the address. The address is not
+    found if the city name matches none of them.
+
+    Parameters
+    ----------
+    index_path : str
+        The path to the index directory.
+    cutoff : float
+        The minimum similarity, between 0 and 1, of a fuzzy matched street.
+    """
+
+    def __init__(
+        self,
+        index_path: str = APP.BAN_INDEX_PATH,
+        cutoff: float = APP.BAN_FUZZY_CUTOFF,
+    ):
+        logger.info("Loading BAN index from: %s", index_path)
+        self.streets = np.load(
+            os.path.join(index_path, STREETS_FILE), mmap_mode="r"
+        )
+        self.offsets = np.load(
+            os.path.join(index_path, OFFSETS_FILE), mmap_mode="r"
+        )
+        self.addresses = np.load(
+            os.path.join(index_path, ADDRESSES_FILE), mmap_mode="r"
+        )
+        cities_path = os.path.join(index_path, CITIES_FILE)
+        if not os.path.exists(cities_path):
+            raise ValueError(
+                f"BAN index {index_path} has no communes, rebuild it"
+            )
+        self.cities = np.load(cities_path, mmap_mode="r")
+        self.cutoff = cutoff
+
+    def get_xy_from_address(self, address: str) -> Tuple[float, float]:
+        x, y, _ = self.get_xy_and_citycode_from_address(address)
+        return x, y
+
+    def get_xy_and_citycode_from_address(
+        self, address: str
+    ) -> Tuple[float, float, Union[str, None]]:
+        postcode, street, number = parse_address(address)
+        if postcode is None:
+            return None, None, None
+
+        street_id = self._find_street(postcode, street, parse_city(address))
+        if street_id is None:
+            return None, None, None
+        citycode = self.streets[street_id].decode().rsplit("|", 1)[1] or None
+
+        start, end = self.offsets[street_id : street_id + 2]
+        addresses = self.addresses[start:end]
+        if number:
+            position = np.searchsorted(addresses["number"], number.encode())
+            if (
+                position < len(addresses)
+                and addresses["number"][position] == number.encode()
+            ):
+                addresses = addresses[position : position + 1]
+            else:
+                closest = self._closest_number(addresses, number)
+                if closest is not None:
+                    addresses = addresses[closest : closest + 1]
+        return (*self._xy(addresses), citycode)
+
+    def _find_street(
+        self, postcode: str, street: str, city: str
+    ) -> Union[int, None]:
+        start, end = self._key_range(f"{postcode}|{street}")
+        if start == end:
+            # Fuzzy match the street among all the streets of the postcode
+            start, end = self._key_range(postcode)
+            candidates = sorted(
+                {
+                    name.decode().split("|")[1]
+                    for name in self.streets[start:end]
+                }
+            )
+            matches = difflib.get_close_matches(
+                street, candidates, n=1, cutoff=self.cutoff
+            )
+            if not matches:
+                return None
+            start, end = self._key_range(f"{postcode}|{matches[0]}")
+        return self._pick_commune(start, end, city)
+
+    def _key_range(self, prefix: str) -> Tuple[int, int]:
+        """Return the range of the streets whose key starts with
+        "<prefix>|"."""
+        # "}" is the character following "|"
+        start, end = np.searchsorted(
+            self.streets, [f"{prefix}|".encode(), f"{prefix}}}".encode()]
+        )
+        return int(start), int(end)
+
+    def _pick_commune(
+        self, start: int, end: int, city: str
+    ) -> Union[int, None]:
+        """Among the streets of the same name in several communes, return the
+        one of the commune named `city`, or None if it is ambiguous."""
+        if end - start == 1:
+            return start
+        cities = [name.decode() for name in self.cities[start:end]]
+        if city in cities:
+            return start + cities.index(city)
+        matches = difflib.get_close_matches(
+            city, cities, n=1, cutoff=self.cutoff
+        )
+        if not matches:
+            return None
+        return start + cities.index(matches[0])
+
+    @staticmethod
+    def _closest_number(
+        addresses: np.ndarray, number: str
+    ) -> Union[int, None]:
+        matches = map(HOUSE_NUMBER_PATTERN.match, addresses["number"])
+        numbers = np.array(
+            [int(match.group()) if match else -1 for match in matches]
+        )
+        if (numbers < 0).all():
+            return None
+        target = int(re.match(r"\d+", number).group())
+        distances = np.where(numbers < 0, np.inf, np.abs(numbers - target))
+        return int(np.argmin(distances))
+
+    @staticmethod
+    def _xy(addresses: np.ndarray) -> Tuple[float, float]:
+        x = float(addresses["x"].mean()) / COORDINATES_SCALE
+        y = float(addresses["y"].mean()) / COORDINATES_SCALE
+        return x, y
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the local index of a BAN CSV extract."
+    )
+    parser.add_argument("csv_path", help="Path to the BAN CSV extract.")
+    parser.add_argument(
+        "index_path",
+        nargs="?",
+        default=APP.BAN_INDEX_PATH,
+        help="Path to the index directory to write.",
+    )
+    args = parser.parse_args()
+    build_ban_index(args.csv_path, args.index_path)
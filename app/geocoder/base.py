@@ -0,0 +1,84 @@
+from abc import ABC, abstractmethod
+from typing import List, Tuple, Union
+
+from app.logger import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Geocoder(ABC):
+    """Interface of the backends turning an address into Lambert 93
+    coordinates."""
+
+    @abstractmethod
+    def get_xy_from_address(self, address: str) -> Tuple[float, float]:
+        """Return the Lambert 93 coordinates of an address.
+
+        Parameters
+        ----------
+        address : str
+            The address to geocode.
+
+        Returns
+        -------
+        Tuple[float, float]
+            The x and y coordinates of the address, or (None, None) if the
+            address is not found.
+        """
+
+    def get_xy_and_citycode_from_address(
+        self, address: str
+    ) -> Tuple[float, float, Union[str, None]]:
+        """Return the Lambert 93 coordinates of an address and the INSEE code
+        of its commune, from a single lookup.
+
+        Parameters
+        ----------
+        address : str
+            The address to geocode.
+
+        Returns
+        -------
+        Tuple[float, float, Union[str, None]]
+            The x and y coordinates of the address, or (None, None) if the
+            address is not found, and the INSEE code of its commune, or None
+            if the backend does not know the communes.
+        """
+        x, y = self.get_xy_from_address(address)
+        return x, y, None
+
+
+class FallbackGeocoder(Geocoder):
+    """Geocoder trying several backends in order until one finds the
+    address.
+
+    Parameters
+    ----------
+    geocoders : List[Geocoder]
+        The backends to query, from the preferred one to the last resort.
+    """
+
+    def __init__(self, geocoders: List[Geocoder]):
+        self.geocoders = geocoders
+
+    def get_xy_from_address(self, address: str) -> Tuple[float, float]:
+        for geocoder in self.geocoders:
+            x, y = geocoder.get_xy_from_address(address)
+            if x is not None and y is not None:
+                return x, y
+            logger.debug(
+                "%s missed address: %s", type(geocoder).__name__, address
+            )
+        return None, None
+
+    def get_xy_and_citycode_from_address(
+        self, address: str
+    ) -> Tuple[float, float, Union[str, None]]:
+        for geocoder in self.geocoders:
+            x, y, citycode = geocoder.get_xy_and_citycode_from_address(address)
+            if x is not None and y is not None:
+                return x, y, citycode
+            logger.debug(
+                "%s missed address: %s", type(geocoder).__name__, address
+            )
+        return None, None, None
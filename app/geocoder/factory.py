@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+from app.api_address.client import APIAddressClient
+from app.constants import GeocoderBackend
+from app.env import APP
+from app.geocoder.ban import BANGeocoder
+from app.geocoder.base import FallbackGeocoder, Geocoder
+
+
+@lru_cache(maxsize=1)
+def get_geocoder() -> Geocoder:
+    """Return the geocoder selected by the `GEOCODER` setting, shared by all
+    the requests of the worker.
+
+    Raises
+    ------
+    ValueError
+        If the geocoder backend is not supported
+    """
+    if APP.GEOCODER not in [backend.value for backend in GeocoderBackend]:
+        raise ValueError(f"Geocoder {APP.GEOCODER} not supported")
+
+    if APP.GEOCODER == GeocoderBackend.BAN:
+        return FallbackGeocoder([BANGeocoder(), APIAddressClient()])
+    return APIAddressClient()
@@ -1,34 +1,267 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 
+from app.constants import METROPOLITAN_BOUNDS, Columns, Generation, Operator
 from app.constants import PROJECTED_COORDINATE_SYSTEM as CRS
 from app.env import APP
 from app.logger import logging
+from app.store import AntennaStore, LiveAntennaStore
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_VERSION = "default"
+
+GENERATIONS = [generation.value for generation in Generation]
+OPERATOR_DTYPE = pd.CategoricalDtype([operator.value for operator in Operator])
+
+CSV_COLUMNS = [Columns.OPERATOR.value, "x", "y", *GENERATIONS]
+
+
+@dataclass
+class IngestionReport:
+    """Outcome of the ingestion of an antennas CSV file.
+
+    Attributes
+    ----------
+    path : str
+        The path to the CSV file.
+    rows_read : int
+        The number of rows of the file.
+    rows_kept : int
+        The number of valid rows.
+    rejected : Dict[str, int]
+        The number of rows rejected for each reason ("unknown_operator",
+        "out_of_bounds", "invalid_flags"). A row can be rejected for several
+        reasons.
+    unknown_operators : Dict[str, int]
+        The number of rows of each operator not in `Operator`.
+    chunks : int
+        The number of chunks the file was read in.
+    seconds : float
+        The duration of the ingestion.
+    """
+
+    path: str
+    rows_read: int = 0
+    rows_kept: int = 0
+    rejected: Dict[str, int] = field(
+        default_factory=lambda: dict.fromkeys(
+            ["unknown_operator", "out_of_bounds", "invalid_flags"], 0
+        )
+    )
+    unknown_operators: Dict[str, int] = field(default_factory=dict)
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_rejected(self) -> int:
+        return self.rows_read - self.rows_kept
+
 
-def load_data() -> gpd.GeoDataFrame:
+def _validate(chunk: pd.DataFrame, report: IngestionReport) -> pd.DataFrame:
+    """Drop the invalid rows of a chunk of antennas, recording them in the
+    report, and convert the valid ones to compact types."""
+    # The operators not in `Operator` get the code -1
+    operator = chunk[Columns.OPERATOR].astype(OPERATOR_DTYPE)
+    unknown_operator = (operator.cat.codes == -1).to_numpy()
+
+    # The values which are not numbers are coerced to NaN, which is neither
+    # within the bounds nor a valid flag
+    x = pd.to_numeric(chunk["x"], errors="coerce").to_numpy(np.float64)
+    y = pd.to_numeric(chunk["y"], errors="coerce").to_numpy(np.float64)
+    xmin, ymin, xmax, ymax = METROPOLITAN_BOUNDS
+    out_of_bounds = ~((x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+
+    flags = np.column_stack(
+        [
+            pd.to_numeric(chunk[generation], errors="coerce").to_numpy(
+                np.float64
+            )
+            for generation in GENERATIONS
+        ]
+    )
+    invalid_flags = ~((flags == 0) | (flags == 1)).all(axis=1)
+
+    valid = ~(unknown_operator | out_of_bounds | invalid_flags)
+    report.chunks += 1
+    report.rows_read += len(chunk)
+    report.rows_kept += int(valid.sum())
+    report.rejected["unknown_operator"] += int(unknown_operator.sum())
+    report.rejected["out_of_bounds"] += int(out_of_bounds.sum())
+    report.rejected["invalid_flags"] += int(invalid_flags.sum())
+    counts = chunk[Columns.OPERATOR][unknown_operator].value_counts(
+        dropna=False
+    )
+    unknown_operators = report.unknown_operators
+    for name, count in counts.items():
+        # Missing operators are counted as "nan"
+        key = str(name)
+        unknown_operators[key] = unknown_operators.get(key, 0) + int(count)
+
+    valid_flags = flags[valid].astype(np.int8)
+    return pd.DataFrame(
+        {
+            Columns.OPERATOR: operator.array[valid],
+            "x": np.round(x[valid]).astype(np.int32),
+            "y": np.round(y[valid]).astype(np.int32),
+            **{
+                generation: valid_flags[:, i]
+                for i, generation in enumerate(GENERATIONS)
+            },
+        }
+    )
+
+
+def read_antennas(
+    path: str, chunk_rows: int = APP.ANTENNAS_CHUNK_ROWS
+) -> Tuple[pd.DataFrame, IngestionReport]:
+    """Read and validate the antennas of a CSV file.
+
+    The rows with an operator not in `Operator`, with coordinates outside
+    of `METROPOLITAN_BOUNDS` or with generation flags other than 0 and 1 are
+    rejected.
+
+    Parameters
+    ----------
+    path : str
+        The path to the CSV file, with the operator, x and y (Lambert 93)
+        and generations columns.
+    chunk_rows : int
+        The number of rows parsed at once, 0 to parse the file in one go.
+        Only the valid rows of each chunk are kept, with compact types, so a
+        file too large for memory can be read in chunks.
+
+    Returns
+    -------
+    pd.DataFrame
+        The valid antennas: a categorical operator column, int32 x and y
+        columns and an int8 column for each generation.
+    IngestionReport
+        The number of rows read, kept and rejected.
+
+    Raises
+    ------
+    ValueError
+        If a column is missing
+    """
+    start = time.perf_counter()
+    report = IngestionReport(path=path)
+    # The types are inferred by the parser, which is faster than asking for
+    # specific ones, and only converted once the invalid values are rejected
+    if chunk_rows:
+        chunks = pd.read_csv(path, usecols=CSV_COLUMNS, chunksize=chunk_rows)
+    else:
+        chunks = [pd.read_csv(path, usecols=CSV_COLUMNS)]
+    antennas_df = pd.concat(
+        [_validate(chunk, report) for chunk in chunks], ignore_index=True
+    )
+    report.seconds = time.perf_counter() - start
+    return antennas_df, report
+
+
+def load_data(
+    path: str = APP.ANTENNAS_DATA_PATH,
+    chunk_rows: int = APP.ANTENNAS_CHUNK_ROWS,
+) -> gpd.GeoDataFrame:
     """This function loads the antennas data from a CSV file and returns a
     GeoDataFrame.
 
+    Parameters
+    ----------
+    path : str
+        The path to the CSV file.
+    chunk_rows : int
+        The number of rows parsed at once, see `read_antennas`.
+
     Returns
     -------
     gpd.GeoDataFrame
-        The antennas data as a GeoDataFrame, with coordinates projected in
-        the Lambert 93 coordinate system.
+        The valid antennas data as a GeoDataFrame, with coordinates projected
+        in the Lambert 93 coordinate system.
     """
-    logger.info("Loading antennas data from: %s", APP.ANTENNAS_DATA_PATH)
+    logger.info("Loading antennas data from: %s", path)
 
-    antennas_df = pd.read_csv(APP.ANTENNAS_DATA_PATH)
+    antennas_df, report = read_antennas(path, chunk_rows)
     antennas_geo_df = gpd.GeoDataFrame(
         antennas_df,
         geometry=gpd.points_from_xy(antennas_df["x"], antennas_df["y"]),
         crs=CRS,
     ).drop(columns=["x", "y"])
 
-    logger.info("Antennas data loaded successfully.")
+    logger.info(
+        "Antennas data loaded successfully: %s rows read, %s kept in %.2fs "
+        "(%s chunks)",
+        report.rows_read,
+        report.rows_kept,
+        report.seconds,
+        report.chunks,
+    )
+    if report.rows_rejected:
+        logger.warning(
+            "%s antennas rejected from %s: %s, unknown operators: %s",
+            report.rows_rejected,
+            path,
+            report.rejected,
+            report.unknown_operators,
+        )
     return antennas_geo_df
 
 
-antennas_geo_df = load_data()
+def parse_datasets(datasets: str) -> Dict[str, str]:
+    """Parse the ANTENNAS_DATASETS setting.
+
+    Example: "2018-01=a.csv,2019-01=b.csv"
+        -> {"2018-01": "a.csv", "2019-01": "b.csv"}
+
+    Raises
+    ------
+    ValueError
+        If a dataset is not a "<version>=<path>" pair
+    """
+    if not datasets.strip():
+        return {DEFAULT_VERSION: APP.ANTENNAS_DATA_PATH}
+
+    res = {}
+    for dataset in datasets.split(","):
+        version, sep, path = dataset.partition("=")
+        if not sep or not version.strip() or not path.strip():
+            raise ValueError(
+                f"Dataset {dataset} is not a <version>=<path> pair"
+            )
+        res[version.strip()] = path.strip()
+    return res
+
+
+def load_store(datasets: str = APP.ANTENNAS_DATASETS) -> AntennaStore:
+    """Load every version of the antennas data into a single store.
+
+    Parameters
+    ----------
+    datasets : str
+        The versions to load, see `parse_datasets`.
+
+    Returns
+    -------
+    AntennaStore
+        The store of the antennas of all the versions.
+    """
+    store = AntennaStore.from_geo_dfs(
+        {
+            version: load_data(path)
+            for version, path in parse_datasets(datasets).items()
+        }
+    )
+    logger.info(
+        "%s antennas stored for versions: %s",
+        len(store.x),
+        ", ".join(store.versions),
+    )
+    return store
+
+
+antennas_store = LiveAntennaStore(load_store())
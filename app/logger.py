@@ -1,16 +1,206 @@
+import atexit
+import copy
+import json
 import logging
+import queue
+import random
 import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterator, Union
 
+from app.constants import LogFormat
 from app.env import APP
 
 LOGGER_DATA_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-LOGGER_FORMAT = "[%(levelname)s][%(asctime)s][%(name)s] %(message)s"
+LOGGER_FORMAT = (
+    "[%(levelname)s][%(asctime)s][%(name)s][%(request_id)s] %(message)s"
+)
+
+# Attributes of every log record, the other ones being given with `extra`
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+}
+
+
+@dataclass
+class RequestContext:
+    """Logging state of the request being handled.
+
+    Attributes
+    ----------
+    request_id : str
+        The correlation id of the request, added to its log lines.
+    sampled : bool
+        Whether the detail lines of the request are logged.
+    stages : Dict[str, float]
+        The time spent in each stage of the request, in seconds.
+    """
 
+    request_id: str
+    sampled: bool
+    stages: Dict[str, float] = field(default_factory=dict)
 
-logging.basicConfig(
-    level=APP.LOG_LEVEL,
-    format=LOGGER_FORMAT,
-    datefmt=LOGGER_DATA_FORMAT,
-    handlers=[logging.StreamHandler(sys.stdout)],
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+_request_context: ContextVar[Union[RequestContext, None]] = ContextVar(
+    "request_context", default=None
 )
+
+
+@contextmanager
+def request_context(
+    request_id: Union[str, None] = None,
+) -> Iterator[RequestContext]:
+    """Handle a request: its log lines carry its id, and its detail lines
+    are logged for a `LOG_DETAIL_SAMPLE_RATE` share of the requests.
+
+    Parameters
+    ----------
+    request_id : Union[str, None]
+        The correlation id of the request, a random one if None.
+
+    Yields
+    ------
+    RequestContext
+        The logging state of the request.
+    """
+    context = RequestContext(
+        request_id=request_id or uuid.uuid4().hex,
+        sampled=random.random() < APP.LOG_DETAIL_SAMPLE_RATE,  # noqa: S311
+    )
+    token = _request_context.set(context)
+    try:
+        yield context
+    finally:
+        _request_context.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the time spent in the block to a stage of the current request."""
+    context = _request_context.get()
+    if context is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        context.add_time(name, time.perf_counter() - start)
+
+
+def add_stage_time(name: str, seconds: float) -> None:
+    """Add some time to a stage of the current request, if any."""
+    context = _request_context.get()
+    if context is not None:
+        context.add_time(name, seconds)
+
+
+def log_details() -> bool:
+    """Whether to log a detail line, e.g. one per address: only for the
+    sampled requests, or for a sample of the lines outside of a request."""
+    context = _request_context.get()
+    if context is None:
+        return random.random() < APP.LOG_DETAIL_SAMPLE_RATE  # noqa: S311
+    return context.sampled
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the id of the current request, or "-", to the log records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get()
+        record.request_id = context.request_id if context else "-"
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Format the log records as JSON objects, with the fields given with
+    `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (name, value)
+            for name, value in vars(record).items()
+            if name not in RECORD_ATTRIBUTES and value is not None
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ExceptionQueueHandler(QueueHandler):
+    """Queue the log records with their traceback in an `exception`
+    attribute, instead of the message as done by `QueueHandler`, so that the
+    JSON formatter writes it in its own field."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        formatter = self.formatter or logging.Formatter()
+        exception = None
+        if record.exc_info:
+            exception = formatter.formatException(record.exc_info)
+        if record.stack_info:
+            stack = formatter.formatStack(record.stack_info)
+            exception = f"{exception}\n{stack}" if exception else stack
+        record = copy.copy(record)
+        record.exc_info = record.exc_text = record.stack_info = None
+        record.exception = exception
+        return super().prepare(record)
+
+
+class TextFormatter(logging.Formatter):
+    """Format the log records as text, with the traceback queued by
+    `ExceptionQueueHandler` after the message."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        exception = getattr(record, "exception", None)
+        if exception:
+            text = f"{text}\n{exception}"
+        return text
+
+
+def _stream_handler(log_format: str) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if log_format == LogFormat.JSON:
+        handler.setFormatter(JSONFormatter())
+    elif log_format == LogFormat.TEXT:
+        handler.setFormatter(
+            TextFormatter(LOGGER_FORMAT, datefmt=LOGGER_DATA_FORMAT)
+        )
+    else:
+        raise ValueError(f"Log format {log_format} not supported")
+    return handler
+
+
+# The records are written to stdout by a background thread, so that logging
+# never blocks the requests on I/O
+log_queue = queue.SimpleQueue()
+queue_handler = ExceptionQueueHandler(log_queue)
+# Only the message and the traceback are formatted before being queued, the
+# stream handler formats the whole record
+queue_handler.setFormatter(logging.Formatter("%(message)s"))
+queue_handler.addFilter(RequestContextFilter())
+listener = QueueListener(log_queue, _stream_handler(APP.LOG_FORMAT))
+listener.start()
+atexit.register(listener.stop)
+
+logging.basicConfig(level=APP.LOG_LEVEL, handlers=[queue_handler])
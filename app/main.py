@@ -1,7 +1,49 @@
-from fastapi import FastAPI
+import time
 
+from fastapi import FastAPI, Request, status
+
+from app.admin_router import router as admin_router
+from app.logger import logging, request_context
 from app.router import router
 
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
 app = FastAPI()
 
 app.include_router(router)
+app.include_router(admin_router)
+
+
+@app.middleware("http")
+async def log_request(request: Request, call_next):
+    """Give each request a correlation id, taken from the X-Request-ID header
+    if set, and log one summary line per request with its stage timings."""
+    with request_context(request.headers.get(REQUEST_ID_HEADER)) as context:
+        start = time.perf_counter()
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            response.headers[REQUEST_ID_HEADER] = context.request_id
+            return response
+        finally:
+            duration = time.perf_counter() - start
+            logger.info(
+                "%s %s %s in %.1f ms",
+                request.method,
+                request.url.path,
+                status_code,
+                duration * 1000,
+                extra={
+                    "method": request.method,
+                    "path": request.url.path,
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 3),
+                    "stages_ms": {
+                        name: round(seconds * 1000, 3)
+                        for name, seconds in context.stages.items()
+                    },
+                },
+            )
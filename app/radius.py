@@ -0,0 +1,231 @@
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from app.constants import Generation
+from app.env import APP
+from app.logger import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "default"
+
+
+def parse_radii(radii: str) -> Dict[str, float]:
+    """Parse a list of coverage radii per generation.
+
+    Example: "2G=30,3G=5,4G=10" -> {"2G": 30.0, "3G": 5.0, "4G": 10.0}
+
+    Raises
+    ------
+    ValueError
+        If a radius is not a "<generation>=<km>" pair
+    """
+    res = {}
+    for radius in radii.split(","):
+        generation, _, km = radius.partition("=")
+        try:
+            res[generation.strip()] = float(km)
+        except ValueError as exc:
+            raise ValueError(
+                f"Radius {radius} is not a <generation>=<km> pair"
+            ) from exc
+    return res
+
+
+def _check_km_coverage(km_coverage: Dict[str, float]) -> None:
+    for generation, km in km_coverage.items():
+        if generation not in [gen.value for gen in Generation]:
+            raise ValueError(f"Generation {generation} not supported")
+        if not 0 < km <= APP.COVERAGE_MAX_KM:
+            raise ValueError(
+                f"Radius of {generation} must be between 0 and "
+                f"{APP.COVERAGE_MAX_KM} km, got {km}"
+            )
+
+
+@dataclass(frozen=True)
+class Region:
+    """Area whose antennas have their own coverage radii, e.g. a dense urban
+    area where the antennas reach less far.
+
+    Attributes
+    ----------
+    name : str
+        The name of the region.
+    bbox : Tuple[float, float, float, float]
+        The Lambert 93 bounding box of the region (xmin, ymin, xmax, ymax), in
+        meters. An antenna belongs to the region if it lies inside the box.
+    km_coverage : Dict[str, float]
+        The coverage radius of the antennas of the region, in kilometers, for
+        some generations.
+    """
+
+    name: str
+    bbox: Tuple[float, float, float, float]
+    km_coverage: Dict[str, float]
+
+    def __post_init__(self):
+        _check_km_coverage(self.km_coverage)
+
+    def contains(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        xmin, ymin, xmax, ymax = self.bbox
+        return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+
+
+@dataclass(frozen=True)
+class RadiusModel:
+    """Coverage radius of the antennas of each generation.
+
+    The radius of an antenna is the one of the first region containing it,
+    or the default radius of its generation.
+
+    Attributes
+    ----------
+    name : str
+        The name of the model.
+    km_coverage : Dict[str, float]
+        The default coverage radius of each generation, in kilometers.
+    regions : Tuple[Region, ...]
+        The regions overriding the default radii, by order of precedence.
+
+    Raises
+    ------
+    ValueError
+        If a generation is not supported, has no default radius, or if a
+        radius is larger than `COVERAGE_MAX_KM`
+    """
+
+    name: str
+    km_coverage: Dict[str, float]
+    regions: Tuple[Region, ...] = field(default=())
+
+    def __post_init__(self):
+        _check_km_coverage(self.km_coverage)
+        for generation in Generation:
+            if generation not in self.km_coverage:
+                raise ValueError(
+                    f"Model {self.name} has no radius for {generation}"
+                )
+
+    def max_radius(self, generation: Generation) -> float:
+        """The largest coverage radius of the generation, in meters."""
+        return 1000 * max(
+            [self.km_coverage[generation]]
+            + [
+                region.km_coverage[generation]
+                for region in self.regions
+                if generation in region.km_coverage
+            ]
+        )
+
+    def radii(
+        self, generation: Generation, x: np.ndarray, y: np.ndarray
+    ) -> Union[float, np.ndarray]:
+        """Return the coverage radius, in meters, of the antennas of the
+        generation located at (x, y).
+
+        Returns
+        -------
+        Union[float, np.ndarray]
+            The radius of each antenna, or a single radius shared by all the
+            antennas if the model has no region for the generation.
+        """
+        default = 1000 * self.km_coverage[generation]
+        regions = [
+            region
+            for region in self.regions
+            if generation in region.km_coverage
+        ]
+        if not regions:
+            return default
+
+        radii = np.full(len(x), default, dtype=np.float64)
+        # Apply the regions from the last one so that the first one wins
+        for region in reversed(regions):
+            radii[region.contains(x, y)] = (
+                1000 * region.km_coverage[generation]
+            )
+        return radii
+
+    @classmethod
+    def from_dict(
+        cls, name: str, model: dict, defaults: Dict[str, float]
+    ) -> "RadiusModel":
+        """Build a model from its JSON description, the generations without
+        radius taking the one of `defaults`.
+
+        Example:
+        {
+            "km_coverage": {"4G": 8},
+            "regions": [
+                {
+                    "name": "paris",
+                    "bbox": [640000, 6850000, 665000, 6875000],
+                    "km_coverage": {"2G": 10, "3G": 2, "4G": 3}
+                }
+            ]
+        }
+        """
+        return cls(
+            name=name,
+            km_coverage={**defaults, **model.get("km_coverage", {})},
+            regions=tuple(
+                Region(
+                    name=region["name"],
+                    bbox=tuple(region["bbox"]),
+                    km_coverage=region["km_coverage"],
+                )
+                for region in model.get("regions", [])
+            ),
+        )
+
+
+def load_radius_models(
+    radii: str = APP.COVERAGE_RADII_KM,
+    models_path: str = APP.COVERAGE_MODELS_PATH,
+) -> Dict[str, RadiusModel]:
+    """Load the radius models: the default one, built from the
+    `COVERAGE_RADII_KM` setting, and the ones described in the JSON file at
+    `COVERAGE_MODELS_PATH`, if any.
+
+    Parameters
+    ----------
+    radii : str
+        The default radii, see `parse_radii`.
+    models_path : str
+        The path to the JSON file mapping model names to their description,
+        see `RadiusModel.from_dict`.
+
+    Returns
+    -------
+    Dict[str, RadiusModel]
+        The radius models by name.
+    """
+    defaults = parse_radii(radii)
+    models = {DEFAULT_MODEL: RadiusModel(DEFAULT_MODEL, defaults)}
+    if models_path:
+        logger.info("Loading radius models from: %s", models_path)
+        with open(models_path) as file:
+            for name, model in json.load(file).items():
+                models[name] = RadiusModel.from_dict(name, model, defaults)
+    return models
+
+
+radius_models = load_radius_models()
+
+
+def get_radius_models(names: List[str]) -> List[RadiusModel]:
+    """Return the radius models with the given names.
+
+    Raises
+    ------
+    ValueError
+        If a model is not found
+    """
+    for name in names:
+        if name not in radius_models:
+            raise ValueError(f"Radius model {name} not found")
+    return [radius_models[name] for name in names]
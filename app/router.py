@@ -1,15 +1,89 @@
-from fastapi import APIRouter
+from typing import Annotated, List, Union
 
-from app.constants import Generation, Operator
-from app.load_data import antennas_geo_df
-from app.schemas import Addresses, NetworkCoverage
-from app.services import get_coverage_from_address
+from fastapi import APIRouter, HTTPException, Query, status
+
+from app.communes import (
+    CommuneCoverageTable,
+    get_commune_coverage_from_address,
+    get_commune_table,
+)
+from app.constants import Granularity
+from app.load_data import antennas_store
+from app.radius import DEFAULT_MODEL, RadiusModel, get_radius_models
+from app.schemas import (
+    Addresses,
+    NetworkCoverage,
+    NetworkCoverageDiff,
+    NetworkCoverageWhatIf,
+)
+from app.services import (
+    CoverageQuery,
+    get_coverage_diff_from_address,
+    get_coverage_from_address,
+    get_coverage_what_if_from_address,
+)
+from app.store import AntennaStore
 
 router = APIRouter()
 
 
+def _check_version(version: Union[str, None]) -> None:
+    if version is not None and version not in antennas_store.versions:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=(
+                f"Version {version} not found, available versions: "
+                f"{', '.join(antennas_store.versions)}"
+            ),
+        )
+
+
+def _get_radius_models(names: List[str]) -> List[RadiusModel]:
+    try:
+        return get_radius_models(names)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+        ) from exc
+
+
+def _get_commune_table(
+    version: Union[str, None], model: str, snapshot: AntennaStore
+) -> CommuneCoverageTable:
+    commune_table = get_commune_table(antennas_store)
+    if commune_table is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No commune coverage table available",
+        )
+    version = version or snapshot.default_version
+    if (commune_table.version, commune_table.model) != (version, model):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=(
+                "The commune coverage table is built for version "
+                f"{commune_table.version} and model {commune_table.model}"
+            ),
+        )
+    if commune_table.generation < snapshot.generation:
+        # An update of the antennas failed to be applied to the table
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=(
+                "The commune coverage table is out of date with the "
+                "antennas data"
+            ),
+        )
+    return commune_table
+
+
 @router.post("/coverage", response_model=NetworkCoverage)
-async def get_coverage(addresses: Addresses):
+def get_coverage(
+    addresses: Addresses,
+    version: Union[str, None] = None,
+    model: str = DEFAULT_MODEL,
+    granularity: Granularity = Granularity.ADDRESS,
+):
     """Given a list of addresses, return the network coverage for each address.
 
     Parameters
@@ -21,6 +95,16 @@ async def get_coverage(addresses: Addresses):
             "address_1": "1 rue de Rivoli, 75001 Paris",
             "address_2": "This is a fake address",
         }
+    version : Union[str, None]
+        The version of the antennas data to use, the default one if None.
+    model : str
+        The name of the radius model giving the coverage radii of the
+        antennas.
+    granularity : Granularity
+        "address" to compute the coverage at the location of each address,
+        or "commune" to read the coverage of the commune of each address
+        from the precomputed commune coverage table, which is much faster
+        but coarser.
 
     Returns
     -------
@@ -51,12 +135,126 @@ async def get_coverage(addresses: Addresses):
             "address_2": None,
         }
     """
+    _check_version(version)
+    (radius_model,) = _get_radius_models([model])
+    if granularity == Granularity.COMMUNE:
+        snapshot = antennas_store.snapshot()
+        commune_table = _get_commune_table(version, model, snapshot)
+        return {
+            key: get_commune_coverage_from_address(
+                address=value,
+                commune_table=commune_table,
+                antennas_store=snapshot,
+                query=CoverageQuery(
+                    version=version, radius_model=radius_model
+                ),
+            )
+            for key, value in addresses.model_dump().items()
+        }
+
+    snapshot = antennas_store.snapshot()
     return {
         key: get_coverage_from_address(
             address=value,
-            antennas_geo_df=antennas_geo_df,
-            generations=list(Generation),
-            operators=list(Operator),
+            antennas_store=snapshot,
+            query=CoverageQuery(version=version, radius_model=radius_model),
+        )
+        for key, value in addresses.model_dump().items()
+    }
+
+
+@router.post("/coverage/diff", response_model=NetworkCoverageDiff)
+def get_coverage_diff(addresses: Addresses, base: str, target: str):
+    """Given a list of addresses, return for each address the network coverage
+    which differs between two versions of the antennas data.
+
+    Parameters
+    ----------
+    addresses : Addresses
+        The addresses to check the coverage.
+        Example:
+        {
+            "address_1": "1 rue de Rivoli, 75001 Paris",
+            "address_2": "This is a fake address",
+        }
+    base : str
+        The version of the antennas data to compare from.
+    target : str
+        The version of the antennas data to compare to.
+
+    Returns
+    -------
+    NetworkCoverageDiff
+        The coverage in both versions of the operators and generations whose
+        coverage changed, for the given addresses.
+        Example:
+        {
+            "address_1": {
+                "Orange": {"4G": {"base": False, "target": True}},
+                "Free": {"3G": {"base": True, "target": False}},
+            },
+            "address_2": None,
+        }
+    """
+    _check_version(base)
+    _check_version(target)
+    snapshot = antennas_store.snapshot()
+    return {
+        key: get_coverage_diff_from_address(
+            address=value,
+            antennas_store=snapshot,
+            base=CoverageQuery(version=base),
+            target=CoverageQuery(version=target),
+        )
+        for key, value in addresses.model_dump().items()
+    }
+
+
+@router.post("/coverage/what-if", response_model=NetworkCoverageWhatIf)
+def get_coverage_what_if(
+    addresses: Addresses,
+    models: Annotated[List[str], Query()],
+    version: Union[str, None] = None,
+):
+    """Given a list of addresses, return the network coverage for each address
+    under several radius models, e.g. `/coverage/what-if?models=a&models=b`.
+
+    Parameters
+    ----------
+    addresses : Addresses
+        The addresses to check the coverage.
+        Example:
+        {
+            "address_1": "1 rue de Rivoli, 75001 Paris",
+            "address_2": "This is a fake address",
+        }
+    models : List[str]
+        The names of the radius models to compute the coverage with.
+    version : Union[str, None]
+        The version of the antennas data to use, the default one if None.
+
+    Returns
+    -------
+    NetworkCoverageWhatIf
+        The coverage of the antennas for each address and radius model.
+        Example:
+        {
+            "address_1": {
+                "default": {"Orange": {"2G": True, "3G": True, "4G": True}},
+                "urban": {"Orange": {"2G": True, "3G": False, "4G": True}},
+            },
+            "address_2": None,
+        }
+    """
+    _check_version(version)
+    radius_models = _get_radius_models(models)
+    snapshot = antennas_store.snapshot()
+    return {
+        key: get_coverage_what_if_from_address(
+            address=value,
+            antennas_store=snapshot,
+            query=CoverageQuery(version=version),
+            radius_models=radius_models,
         )
         for key, value in addresses.model_dump().items()
     }
@@ -1,6 +1,13 @@
-from typing import Dict, Union
+from typing import Annotated, Dict, List, Union
 
-from pydantic import RootModel
+from pydantic import BaseModel, ConfigDict, Field, RootModel, field_validator
+
+from app.constants import METROPOLITAN_BOUNDS, Operator
+
+# Lambert 93 coordinates of metropolitan France, the ones accepted when
+# loading the antennas data files
+X = Annotated[int, Field(ge=METROPOLITAN_BOUNDS[0], le=METROPOLITAN_BOUNDS[2])]
+Y = Annotated[int, Field(ge=METROPOLITAN_BOUNDS[1], le=METROPOLITAN_BOUNDS[3])]
 
 
 class Addresses(RootModel):
@@ -9,3 +16,54 @@ class Addresses(RootModel):
 
 class NetworkCoverage(RootModel):
     root: Dict[str, Union[Dict[str, Dict[str, bool]], None]]
+
+
+class NetworkCoverageDiff(RootModel):
+    root: Dict[str, Union[Dict[str, Dict[str, Dict[str, bool]]], None]]
+
+
+class NetworkCoverageWhatIf(RootModel):
+    root: Dict[str, Union[Dict[str, Dict[str, Dict[str, bool]]], None]]
+
+
+class AntennaPatch(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    operator: Union[Operator, None] = None
+    x: Union[X, None] = None
+    y: Union[Y, None] = None
+    two_g: Union[bool, None] = Field(default=None, alias="2G")
+    three_g: Union[bool, None] = Field(default=None, alias="3G")
+    four_g: Union[bool, None] = Field(default=None, alias="4G")
+
+    @field_validator("*")
+    @classmethod
+    def check_not_null(cls, value):
+        # The fields left out are unchanged, an explicit null is rejected
+        # rather than written to the antenna
+        if value is None:
+            raise ValueError("Field can't be null")
+        return value
+
+
+class Antenna(AntennaPatch):
+    operator: Operator
+    x: X
+    y: Y
+    two_g: bool = Field(alias="2G")
+    three_g: bool = Field(alias="3G")
+    four_g: bool = Field(alias="4G")
+
+
+class StoredAntenna(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: int
+    # None for the antennas of an operator not in `Operator`
+    operator: Union[Operator, None]
+    x: int
+    y: int
+    two_g: bool = Field(alias="2G")
+    three_g: bool = Field(alias="3G")
+    four_g: bool = Field(alias="4G")
+    versions: List[str]
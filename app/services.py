@@ -1,37 +1,62 @@
+import math
+from dataclasses import dataclass, field, replace
 from typing import Dict, List, Union
 
-import geopandas as gpd
-import pandas as pd
+import numpy as np
 
-from app.api_address.client import APIAddressClient
-from app.constants import PROJECTED_COORDINATE_SYSTEM as CRS
-from app.constants import Columns, Generation, Operator
-from app.logger import logging
+from app.constants import METROPOLITAN_BOUNDS, Generation, Operator
+from app.geocoder.factory import get_geocoder
+from app.logger import log_details, logging, stage
+from app.radius import DEFAULT_MODEL, RadiusModel, radius_models
+from app.spatial import hilbert_keys
+from app.store import OPERATORS, AntennaStore, generation_bit
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of locations whose distance to the candidate antennas is
+# computed at once by `coverage_batch`
+BATCH_BLOCK_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class CoverageQuery:
+    """What to check the coverage of the antennas for.
+
+    Attributes
+    ----------
+    generations : List[Generation]
+        The generations to check the coverage, all of them by default.
+    operators : List[Operator]
+        The operators to check the coverage, all of them by default.
+    version : Union[str, None]
+        The version of the antennas data to use, the default one if None.
+    radius_model : Union[RadiusModel, None]
+        The coverage radii of the antennas, the default model if None.
+    """
+
+    generations: List[Generation] = field(
+        default_factory=lambda: list(Generation)
+    )
+    operators: List[Operator] = field(default_factory=lambda: list(Operator))
+    version: Union[str, None] = None
+    radius_model: Union[RadiusModel, None] = None
+
 
 def get_coverage_from_address(
-    address: str,
-    antennas_geo_df: gpd.GeoDataFrame,
-    generations: List[Generation],
-    operators: List[Operator],
+    address: str, antennas_store: AntennaStore, query: CoverageQuery
 ) -> Union[Dict[str, Dict[str, bool]], None]:
-    """Given an address and the geo dataframe of antennas, return the coverage
+    """Given an address and the store of antennas, return the coverage
     of the antennas for the given generations and operators.
 
     Parameters
     ----------
     address : str
         The address to check the coverage.
-    antennas_geo_df : gpd.GeoDataFrame
-        The geo dataframe of antennas. It must contain a column for each
-        generation with 1 if the antenna supports the generation, 0 otherwise.
-        It must also contain a column for the operator.
-    generations : List[Generation]
-        The generations to check the coverage.
-    operators : List[Operator]
-        The operators to check the coverage.
+    antennas_store : AntennaStore
+        The store of antennas.
+    query : CoverageQuery
+        The generations, operators, version and radius model to check the
+        coverage.
 
     Returns
     -------
@@ -41,45 +66,122 @@ def get_coverage_from_address(
         especially if there are multiple addresses to check.
         Example:
         {
-            "2G": {
-                "Orange": True,
-                "SFR": False,
-                "Bouygues": True,
-                "Free": False,
-            },
-            "3G": {
-                "Orange": True,
-                "SFR": False,
-                "Bouygues": True,
-                "Free": False,
-            },
-            "4G": {
-                "Orange": True,
-                "SFR": False,
-                "Bouygues": True,
-                "Free": False,
-            },
+            "Orange": {"2G": True, "3G": True, "4G": True},
+            "SFR": {"2G": False, "3G": True, "4G": True},
+            "Bouygues": {"2G": True, "3G": False, "4G": True},
+            "Free": {"2G": False, "3G": False, "4G": True},
         }
     """
 
-    client = APIAddressClient()
-    x, y = client.get_xy_from_address(address)
+    with stage("geocoding"):
+        x, y = get_geocoder().get_xy_from_address(address)
     if x is None or y is None:
         # If no address found, return None so that the API call doesn't fail
         # especially if there are multiple addresses to check
         return None
 
-    return coverage(x, y, antennas_geo_df, generations, operators)
+    with stage("coverage"):
+        return coverage(x, y, antennas_store, query)
+
+
+def get_coverage_diff_from_address(
+    address: str,
+    antennas_store: AntennaStore,
+    base: CoverageQuery,
+    target: CoverageQuery,
+) -> Union[Dict[str, Dict[str, Dict[str, bool]]], None]:
+    """Given an address and the store of antennas, return the coverage
+    differences between two queries, e.g. two versions of the antennas data.
+
+    Parameters
+    ----------
+    address : str
+        The address to check the coverage.
+    antennas_store : AntennaStore
+        The store of antennas.
+    base : CoverageQuery
+        The coverage to compare from.
+    target : CoverageQuery
+        The coverage to compare to, for the same generations and operators
+        as `base`.
+
+    Returns
+    -------
+    Union[Dict[str, Dict[str, Dict[str, bool]]], None]
+        The coverage in both versions of the operators and generations whose
+        coverage changed. If no address found, return None.
+        Example:
+        {
+            "Orange": {"4G": {"base": False, "target": True}},
+            "Free": {"3G": {"base": True, "target": False}},
+        }
+    """
+    with stage("geocoding"):
+        x, y = get_geocoder().get_xy_from_address(address)
+    if x is None or y is None:
+        return None
+
+    with stage("coverage"):
+        base_coverage = coverage(x, y, antennas_store, base)
+        target_coverage = coverage(x, y, antennas_store, target)
+
+    res = {}
+    for operator, base_generations in base_coverage.items():
+        changes = {
+            generation: {"base": covered, "target": not covered}
+            for generation, covered in base_generations.items()
+            if target_coverage[operator][generation] != covered
+        }
+        if changes:
+            res[operator] = changes
+    return res
+
+
+def get_coverage_what_if_from_address(
+    address: str,
+    antennas_store: AntennaStore,
+    query: CoverageQuery,
+    radius_models: List[RadiusModel],
+) -> Union[Dict[str, Dict[str, Dict[str, bool]]], None]:
+    """Given an address and the store of antennas, return the coverage of the
+    antennas under several radius models.
+
+    Parameters
+    ----------
+    address : str
+        The address to check the coverage.
+    antennas_store : AntennaStore
+        The store of antennas.
+    query : CoverageQuery
+        The generations, operators and version to check the coverage, its
+        radius model being replaced by each of `radius_models`.
+    radius_models : List[RadiusModel]
+        The radius models to compute the coverage with.
+
+    Returns
+    -------
+    Union[Dict[str, Dict[str, Dict[str, bool]]], None]
+        The coverage of the antennas for each radius model. If no address
+        found, return None.
+        Example:
+        {
+            "default": {"Orange": {"2G": True, "3G": True, "4G": True}},
+            "urban": {"Orange": {"2G": True, "3G": False, "4G": True}},
+        }
+    """
+    with stage("geocoding"):
+        x, y = get_geocoder().get_xy_from_address(address)
+    if x is None or y is None:
+        return None
+
+    with stage("coverage"):
+        return coverage_what_if(x, y, antennas_store, query, radius_models)
 
 
 def coverage(
-    x: float,
-    y: float,
-    antennas_geo_df: gpd.GeoDataFrame,
-    generations: List[Generation],
-    operators: List[Operator],
+    x: float, y: float, antennas_store: AntennaStore, query: CoverageQuery
 ) -> Dict[str, Dict[str, bool]]:
-    """Given a location (x, y) and the geo dataframe of antennas, return the
+    """Given a location (x, y) and the store of antennas, return the
     coverage of the antennas for the given generations and operators.
 
     Parameters
@@ -88,14 +190,11 @@ def coverage(
         The x coordinate of the location to check the coverage.
     y : float
         The y coordinate of the location to check the coverage.
-    antennas_geo_df : gpd.GeoDataFrame
-        The geo dataframe of antennas. It must contain a column for each
-        generation with 1 if the antenna supports the generation, 0 otherwise.
-        It must also contain a column for the operator.
-    generations : List[Generation]
-        The generations to check the coverage.
-    operators : List[Operator]
-        The operators to check the coverage.
+    antennas_store : AntennaStore
+        The store of antennas.
+    query : CoverageQuery
+        The generations, operators, version and radius model to check the
+        coverage.
 
     Returns
     -------
@@ -103,24 +202,64 @@ def coverage(
         The coverage of the antennas for the given generations and operators.
         Example:
         {
-            "2G": {
-                "Orange": True,
-                "SFR": False,
-                "Bouygues": True,
-                "Free": False,
-            },
-            "3G": {
-                "Orange": True,
-                "SFR": False,
-                "Bouygues": True,
-                "Free": False,
-            },
-            "4G": {
-                "Orange": True,
-                "SFR": False,
-                "Bouygues": True,
-                "Free": False,
-            },
+            "Orange": {"2G": True, "3G": True, "4G": True},
+            "SFR": {"2G": False, "3G": True, "4G": True},
+            "Bouygues": {"2G": True, "3G": False, "4G": True},
+            "Free": {"2G": False, "3G": False, "4G": True},
+        }
+
+    Raises
+    ------
+    ValueError
+        If the generation is not supported
+    ValueError
+        If the operator is not supported
+    ValueError
+        If the version is not loaded
+    """
+    radius_model = query.radius_model or radius_models[DEFAULT_MODEL]
+    return coverage_what_if(x, y, antennas_store, query, [radius_model])[
+        radius_model.name
+    ]
+
+
+def coverage_what_if(
+    x: float,
+    y: float,
+    antennas_store: AntennaStore,
+    query: CoverageQuery,
+    radius_models: List[RadiusModel],
+) -> Dict[str, Dict[str, Dict[str, bool]]]:
+    """Given a location (x, y) and the store of antennas, return the
+    coverage of the antennas for the given generations and operators under
+    several radius models.
+
+    The antennas around the location and their distance to it are only
+    computed once per generation, for the largest radius of the models, and
+    then compared to the radii of each model.
+
+    Parameters
+    ----------
+    x : float
+        The x coordinate of the location to check the coverage.
+    y : float
+        The y coordinate of the location to check the coverage.
+    antennas_store : AntennaStore
+        The store of antennas.
+    query : CoverageQuery
+        The generations, operators and version to check the coverage, its
+        radius model being replaced by each of `radius_models`.
+    radius_models : List[RadiusModel]
+        The radius models to compute the coverage with.
+
+    Returns
+    -------
+    Dict[str, Dict[str, Dict[str, bool]]]
+        The coverage of the antennas for each radius model.
+        Example:
+        {
+            "default": {"Orange": {"2G": True, "3G": True, "4G": True}},
+            "urban": {"Orange": {"2G": True, "3G": False, "4G": True}},
         }
 
     Raises
@@ -129,8 +268,196 @@ def coverage(
         If the generation is not supported
     ValueError
         If the operator is not supported
+    ValueError
+        If the version is not loaded
+    """
+    _check_generations_and_operators(query.generations, query.operators)
+    coverages = _coverage_per_model(x, y, antennas_store, query, radius_models)
+    return {
+        radius_model.name: coverage
+        for radius_model, coverage in zip(
+            radius_models, coverages, strict=True
+        )
+    }
+
+
+def coverage_batch(
+    x: np.ndarray,
+    y: np.ndarray,
+    antennas_store: AntennaStore,
+    query: CoverageQuery,
+) -> np.ndarray:
+    """Given many locations and the store of antennas, return the coverage
+    of the antennas for the given generations and operators at each location.
+
+    The locations are sorted by cell of the spatial index, the cells
+    following a Hilbert curve, and then along a Hilbert curve within their
+    cell. The locations of a cell thus form a run whose candidate antennas
+    are looked up once: the antennas reaching the whole cell cover all of its
+    locations, and only the distances to the antennas reaching part of it
+    are computed, for all the locations of the run at once. The coverages
+    are then put back in the order of the locations.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The x coordinates of the locations to check the coverage.
+    y : np.ndarray
+        The y coordinates of the locations to check the coverage.
+    antennas_store : AntennaStore
+        The store of antennas.
+    query : CoverageQuery
+        The generations, operators, version and radius model to check the
+        coverage.
+
+    Returns
+    -------
+    np.ndarray
+        Whether each location is covered by each operator for each
+        generation, of shape (locations, operators, generations).
+
+    Raises
+    ------
+    ValueError
+        If the generation is not supported
+    ValueError
+        If the operator is not supported
+    ValueError
+        If the version is not loaded
     """
+    return _coverage_batch(x, y, antennas_store, query, sort=True)
+
+
+def _coverage_batch(
+    x: np.ndarray,
+    y: np.ndarray,
+    antennas_store: AntennaStore,
+    query: CoverageQuery,
+    sort: bool,
+) -> np.ndarray:
+    """`coverage_batch`, with the locations sorted or kept in their order,
+    their runs then being the consecutive locations in the same cell, so
+    that the gain of the sort can be measured."""
+    generations, operators = query.generations, query.operators
+    _check_generations_and_operators(generations, operators)
+    version_bit = antennas_store.version_bit(query.version)
+    radius_model = query.radius_model or radius_models[DEFAULT_MODEL]
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    coverages = np.zeros((len(x), len(operators), len(generations)), bool)
+    if not len(x):
+        return coverages
+
+    index = antennas_store.index
+    ix, iy = index.cell_of(x, y)
+    if sort:
+        # Sort the locations by cell of the index, the cells following a
+        # Hilbert curve on the grid, then along the Hilbert curve within
+        # their cell
+        order = np.lexsort(
+            (
+                hilbert_keys(x, y, METROPOLITAN_BOUNDS),
+                _grid_hilbert_keys(ix, iy),
+            )
+        )
+    else:
+        order = np.arange(len(x))
+    x, y, ix, iy = x[order], y[order], ix[order], iy[order]
+
+    boundaries = np.flatnonzero((np.diff(ix) != 0) | (np.diff(iy) != 0))
+    starts = np.concatenate(([0], boundaries + 1))
+    ends = np.concatenate((boundaries + 1, [len(x)]))
+    half_diagonal = index.cell_size * math.sqrt(2) / 2
+    operator_codes = [OPERATORS.index(operator) for operator in operators]
+
+    for start, end in zip(starts, ends, strict=True):
+        run = slice(start, end)
+        center_x = (ix[start] + 0.5) * index.cell_size
+        center_y = (iy[start] + 0.5) * index.cell_size
+        for g, generation in enumerate(generations):
+            candidates = index.query(
+                center_x,
+                center_y,
+                radius_model.max_radius(generation) + half_diagonal,
+            )
+            candidates = candidates[
+                (
+                    antennas_store.generations[candidates]
+                    & generation_bit(generation)
+                    != 0
+                )
+                & (antennas_store.membership[candidates] & version_bit != 0)
+            ]
+            antennas_x = antennas_store.x[candidates].astype(np.float64)
+            antennas_y = antennas_store.y[candidates].astype(np.float64)
+            antennas_operator = antennas_store.operator[candidates]
+            radii = np.broadcast_to(
+                radius_model.radii(generation, antennas_x, antennas_y),
+                candidates.shape,
+            )
+            # Every location of the cell is within half a diagonal of its
+            # center, so an antenna covers all of them if it reaches that
+            # far past the center, and none of them if it stops that short
+            center_distances = np.hypot(
+                antennas_x - center_x, antennas_y - center_y
+            )
+            covers_cell = center_distances + half_diagonal <= radii
+            reaches_cell = center_distances - half_diagonal <= radii
+
+            for o, code in enumerate(operator_codes):
+                of_operator = antennas_operator == code
+                if (covers_cell & of_operator).any():
+                    coverages[run, o, g] = True
+                    continue
+                selected = np.flatnonzero(reaches_cell & of_operator)
+                if len(selected):
+                    coverages[run, o, g] = _in_range_of_any(
+                        x[run],
+                        y[run],
+                        antennas_x[selected],
+                        antennas_y[selected],
+                        radii[selected],
+                    )
+
+    res = np.empty_like(coverages)
+    res[order] = coverages
+    return res
+
+
+def _in_range_of_any(
+    x: np.ndarray,
+    y: np.ndarray,
+    antennas_x: np.ndarray,
+    antennas_y: np.ndarray,
+    radii: np.ndarray,
+) -> np.ndarray:
+    """Return whether each location (x, y) is within the radius of any of
+    the antennas, computing the distances `BATCH_BLOCK_SIZE` locations at a
+    time."""
+    res = np.empty(len(x), dtype=bool)
+    squared_radii = radii * radii
+    for start in range(0, len(x), BATCH_BLOCK_SIZE):
+        block = slice(start, start + BATCH_BLOCK_SIZE)
+        squared_distances = (x[block, None] - antennas_x) ** 2 + (
+            y[block, None] - antennas_y
+        ) ** 2
+        res[block] = (squared_distances <= squared_radii).any(axis=1)
+    return res
+
+
+def _grid_hilbert_keys(ix: np.ndarray, iy: np.ndarray) -> np.ndarray:
+    """Return the position of grid cells along a Hilbert curve whose steps
+    are the cells."""
+    xmin, ymin = ix.min(), iy.min()
+    order = max(int(max(ix.max() - xmin, iy.max() - ymin)).bit_length(), 1)
+    side = 1 << order
+    return hilbert_keys(ix, iy, (xmin, ymin, xmin + side, ymin + side), order)
+
 
+def _check_generations_and_operators(
+    generations: List[Generation], operators: List[Operator]
+) -> None:
     for generation in generations:
         if generation not in [gen.value for gen in Generation]:
             raise ValueError(f"Generation {generation} not supported")
@@ -138,39 +465,24 @@ def coverage(
         if operator not in [op.value for op in Operator]:
             raise ValueError(f"Operator {operator} not supported")
 
-    res = []
-    for generation in generations:
-        coverage = _coverage_of_one_generation(
-            x=x,
-            y=y,
-            antennas_geo_df=antennas_geo_df,
-            generation=generation,
-            operators=operators,
-        )
-        res.append(coverage)
-
-    return pd.concat(res, axis=1).to_dict(orient="index")
-
 
 def _coverage_of_one_generation(
     x: float,
     y: float,
-    antennas_geo_df: gpd.GeoDataFrame,
+    antennas_store: AntennaStore,
     generation: Generation,
-    operators: List[Operator],
-) -> pd.DataFrame:
-    """Given a location (x, y) and the geo dataframe of antennas, return the
+    query: CoverageQuery,
+) -> Dict[str, bool]:
+    """Given a location (x, y) and the store of antennas, return the
     coverage of the antennas for the given generation and operators.
     The coverage is computed by checking if the location is within the range
-    of the antennas supporting the generation. This is done using GeoPandas
-    overlay function to intersect the location with the range of the antennas.
+    of the antennas supporting the generation.
 
-    After methodology comparison, this was the fastest way I found to compute
-    the coverage. The other method was to compute the distance between the
-    location and each antenna and check if the distance is less than the range
-    of the antennas supporting the generation. This method wasn't slow (mean
-    exec. time = 0.39s on 111 iterations) but it was slower than the current
-    method (mean exec. time = 0.23s on 111 iterations).
+    The spatial index of the store narrows the antennas down to the ones in
+    the grid cells around the location, and their exact distance to the
+    location is then computed in a vectorized way. This replaces the GeoPandas
+    overlay of a buffer around the location with the whole geo dataframe,
+    whose cost grew with the number of antennas.
 
     Parameters
     ----------
@@ -178,18 +490,17 @@ def _coverage_of_one_generation(
         The x coordinate of the location to check the coverage.
     y : float
         The y coordinate of the location to check the coverage.
-    antennas_geo_df : gpd.GeoDataFrame
-        The geo dataframe of antennas. It must contain a column for each
-        generation with 1 if the antenna supports the generation, 0 otherwise.
-        It must also contain a column for the operator.
+    antennas_store : AntennaStore
+        The store of antennas.
     generation : Generation
         The generation to check the coverage.
-    operators : List[Operator]
-        The operators to check the coverage.
+    query : CoverageQuery
+        The operators, version and radius model to check the coverage, its
+        generations being ignored.
 
     Returns
     -------
-    pd.DataFrame
+    Dict[str, bool]
         The coverage of the antennas for the given generation and operators.
         Example:
         {
@@ -199,23 +510,74 @@ def _coverage_of_one_generation(
             "Free": False,
         }
     """
-    location = gpd.GeoDataFrame(
-        geometry=gpd.points_from_xy([x], [y]),
-        crs=CRS,
+    radius_model = query.radius_model or radius_models[DEFAULT_MODEL]
+    (coverage,) = _coverage_per_model(
+        x,
+        y,
+        antennas_store,
+        replace(query, generations=[generation]),
+        [radius_model],
     )
+    return {
+        operator: generations[generation]
+        for operator, generations in coverage.items()
+    }
 
-    antenna_range = gpd.GeoDataFrame(
-        geometry=location.buffer(generation.km_coverage * 1000), crs=CRS
-    )
-    coverage = antenna_range.overlay(
-        antennas_geo_df[antennas_geo_df[generation] == 1], keep_geom_type=False
-    )
-    coverage = coverage.groupby(Columns.OPERATOR)[[generation]].sum()
-    coverage = coverage.reindex([op.value for op in operators], fill_value=0)
 
-    logger.info(
-        "Number of %s antennas: %s",
-        generation,
-        coverage.sum().values[0],
-    )
-    return coverage > 0
+def _coverage_per_model(
+    x: float,
+    y: float,
+    antennas_store: AntennaStore,
+    query: CoverageQuery,
+    radius_models: List[RadiusModel],
+) -> List[Dict[str, Dict[str, bool]]]:
+    """Same as `coverage`, for each of the radius models, the radius model of
+    the query being ignored.
+
+    The antennas around the location and their distance to it are only
+    computed once per generation, for the largest radius of the models.
+    """
+    version_bit = antennas_store.version_bit(query.version)
+
+    res = [
+        {operator: {} for operator in query.operators} for _ in radius_models
+    ]
+    for generation in query.generations:
+        max_radius = max(
+            model.max_radius(generation) for model in radius_models
+        )
+        candidates = antennas_store.index.query(x, y, max_radius)
+        candidates = candidates[
+            (
+                antennas_store.generations[candidates]
+                & generation_bit(generation)
+                != 0
+            )
+            & (antennas_store.membership[candidates] & version_bit != 0)
+        ]
+        antennas_x = antennas_store.x[candidates]
+        antennas_y = antennas_store.y[candidates]
+        squared_distances = (antennas_x - x) ** 2 + (antennas_y - y) ** 2
+        # Antennas of unknown operators are counted in the first bin and
+        # ignored
+        operator_bins = antennas_store.operator[candidates] + 1
+
+        for radius_model, coverage in zip(radius_models, res, strict=True):
+            radii = radius_model.radii(generation, antennas_x, antennas_y)
+            in_range = squared_distances <= radii * radii
+            counts = np.bincount(
+                operator_bins[in_range], minlength=len(OPERATORS) + 1
+            )[1:]
+
+            if log_details():
+                logger.info(
+                    "Number of %s antennas (%s radii): %s",
+                    generation,
+                    radius_model.name,
+                    counts.sum(),
+                )
+            for operator in query.operators:
+                coverage[operator][generation] = bool(
+                    counts[OPERATORS.index(operator)]
+                )
+    return res
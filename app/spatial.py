@@ -0,0 +1,203 @@
+import math
+from typing import Dict, Tuple
+
+import numpy as np
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+# Number of bits of each coordinate on the Hilbert curve: over metropolitan
+# France, a step of the curve is about 26 meters
+HILBERT_ORDER = 16
+
+
+def hilbert_keys(
+    x: np.ndarray,
+    y: np.ndarray,
+    bounds: Tuple[float, float, float, float],
+    order: int = HILBERT_ORDER,
+) -> np.ndarray:
+    """Return the position of points along a Hilbert curve filling a bounding
+    box.
+
+    Points close along the curve are close in the plane, so sorting points by
+    their key groups the neighbouring ones together in memory.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The x coordinates of the points.
+    y : np.ndarray
+        The y coordinates of the points.
+    bounds : Tuple[float, float, float, float]
+        The box filled by the curve (xmin, ymin, xmax, ymax). The points
+        outside of it get the key of the closest point of the box.
+    order : int
+        The number of bits of each coordinate, the curve dividing the box in
+        a grid of 2^order by 2^order cells.
+
+    Returns
+    -------
+    np.ndarray
+        The keys of the points, between 0 and 4^order - 1 (int64).
+    """
+    xmin, ymin, xmax, ymax = bounds
+    side = 1 << order
+    scale = side / max(xmax - xmin, ymax - ymin)
+    ix = np.clip((np.asarray(x, dtype=np.float64) - xmin) * scale, 0, side - 1)
+    iy = np.clip((np.asarray(y, dtype=np.float64) - ymin) * scale, 0, side - 1)
+    ix, iy = ix.astype(np.int64), iy.astype(np.int64)
+
+    keys = np.zeros(len(ix), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (ix & s) > 0
+        ry = (iy & s) > 0
+        keys += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so that the curve is continuous
+        flip = rx & ~ry
+        ix = np.where(flip, side - 1 - ix, ix)
+        iy = np.where(flip, side - 1 - iy, iy)
+        ix, iy = np.where(ry, ix, iy), np.where(ry, iy, ix)
+        s >>= 1
+    return keys
+
+
+class GridIndex:
+    """Spatial index bucketing points into the square cells of a uniform
+    grid over the Lambert 93 plane.
+
+    A query only looks at the cells intersecting the bounding box of the
+    searched disk, so it is valid for any radius: the cell size only trades
+    the number of cells visited against the number of candidates returned.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The x coordinates of the points to index.
+    y : np.ndarray
+        The y coordinates of the points to index.
+    cell_size : float
+        The side of a cell, in meters.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError(f"Cell size must be positive, got {cell_size}")
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {}
+
+        ix, iy = self.cell_of(x, y)
+        order = np.lexsort((iy, ix))
+        ix, iy = ix[order], iy[order]
+        boundaries = np.flatnonzero((np.diff(ix) != 0) | (np.diff(iy) != 0))
+        starts = np.concatenate(([0], boundaries + 1))
+        ends = np.concatenate((boundaries + 1, [len(order)]))
+        for start, end in zip(starts, ends, strict=True):
+            if start < end:
+                cell = (int(ix[start]), int(iy[start]))
+                self.cells[cell] = order[start:end]
+
+    def updated(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        added: np.ndarray,
+        removed: np.ndarray,
+    ) -> "GridIndex":
+        """Return a copy of the index with some points added and removed.
+
+        Only the cells of these points are rebuilt, the other ones are shared
+        with this index, which is left untouched so that the queries running
+        on it stay consistent.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            The x coordinates of all the points, by id.
+        y : np.ndarray
+            The y coordinates of all the points, by id.
+        added : np.ndarray
+            The ids of the points to add.
+        removed : np.ndarray
+            The ids of the points to remove.
+
+        Returns
+        -------
+        GridIndex
+            The updated index.
+        """
+        index = GridIndex.__new__(GridIndex)
+        index.cell_size = self.cell_size
+        index.cells = dict(self.cells)
+
+        ix, iy = self.cell_of(x[removed], y[removed])
+        for point, i, j in zip(removed, ix, iy, strict=True):
+            cell = index.cells[(int(i), int(j))]
+            cell = cell[cell != point]
+            if len(cell):
+                index.cells[(int(i), int(j))] = cell
+            else:
+                del index.cells[(int(i), int(j))]
+
+        ix, iy = self.cell_of(x[added], y[added])
+        for point, i, j in zip(added, ix, iy, strict=True):
+            cell = index.cells.get((int(i), int(j)), EMPTY)
+            index.cells[(int(i), int(j))] = np.append(cell, point)
+        return index
+
+    def contains(self, x: float, y: float, point: int) -> bool:
+        """Whether the point with the given id and coordinates is indexed."""
+        ix, iy = self.cell_of(np.array([x]), np.array([y]))
+        cell = self.cells.get((int(ix[0]), int(iy[0])), EMPTY)
+        return bool((cell == point).any())
+
+    def cell_of(
+        self, x: np.ndarray, y: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the column and row indices of the cells of the points."""
+        return (
+            np.floor_divide(x, self.cell_size).astype(np.int64),
+            np.floor_divide(y, self.cell_size).astype(np.int64),
+        )
+
+    def query(self, x: float, y: float, radius: float) -> np.ndarray:
+        """Return the ids of the points which may be within `radius` meters
+        of the location (x, y).
+
+        The result is a superset of the points within the radius: the caller
+        is expected to check the exact distance of the candidates.
+
+        Parameters
+        ----------
+        x : float
+            The x coordinate of the location.
+        y : float
+            The y coordinate of the location.
+        radius : float
+            The search radius, in meters.
+
+        Returns
+        -------
+        np.ndarray
+            The ids of the candidate points.
+        """
+        cell_size = self.cell_size
+        cx, cy = math.floor(x / cell_size), math.floor(y / cell_size)
+        k = math.ceil(radius / cell_size)
+        squared_radius = radius * radius
+
+        candidates = []
+        for i in range(cx - k, cx + k + 1):
+            # Distance from the location to the column of cells
+            dx = max(i * cell_size - x, 0.0, x - (i + 1) * cell_size)
+            for j in range(cy - k, cy + k + 1):
+                cell = self.cells.get((i, j))
+                if cell is None:
+                    continue
+                dy = max(j * cell_size - y, 0.0, y - (j + 1) * cell_size)
+                if dx * dx + dy * dy <= squared_radius:
+                    candidates.append(cell)
+
+        if not candidates:
+            return EMPTY
+        return np.concatenate(candidates)
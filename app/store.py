@@ -0,0 +1,523 @@
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Union
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from app.constants import METROPOLITAN_BOUNDS, Columns, Generation, Operator
+from app.env import APP
+from app.logger import logging
+from app.spatial import GridIndex, hilbert_keys
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = list(Operator)
+GENERATIONS = list(Generation)
+
+# Antennas of an operator not in `Operator` are kept with this code so that
+# they never cover anything
+UNKNOWN_OPERATOR = -1
+
+# The versions an antenna belongs to are stored as the bits of an integer
+MAX_VERSIONS = 32
+
+COLUMNS = ["x", "y", "operator", "generations", "membership", "ids"]
+
+
+class AntennaNotFoundError(ValueError):
+    pass
+
+
+def generation_bit(generation: Generation) -> int:
+    return 1 << GENERATIONS.index(generation)
+
+
+@dataclass(eq=False)
+class AntennaStore:
+    """Columnar storage of the antennas of one or several dataset versions,
+    with its spatial index.
+
+    The antennas common to several versions (same operator, location and
+    generations) are stored once: each antenna holds a bitmask of the
+    versions it belongs to, so that loading a new release only costs the
+    antennas that changed.
+
+    The antennas loaded from the datasets are ordered along a Hilbert curve,
+    so that neighbouring antennas, which are looked up together, are stored
+    next to each other.
+
+    Attributes
+    ----------
+    versions : List[str]
+        The names of the dataset versions, the i-th one being the i-th bit of
+        `membership`. The last one is the default version.
+    x : np.ndarray
+        The x coordinates of the antennas, in meters (int32).
+    y : np.ndarray
+        The y coordinates of the antennas, in meters (int32).
+    operator : np.ndarray
+        The index of the operator of the antennas in `Operator`, or
+        `UNKNOWN_OPERATOR` (int8).
+    generations : np.ndarray
+        The bitmask of the generations supported by the antennas, see
+        `generation_bit` (uint8).
+    membership : np.ndarray
+        The bitmask of the versions the antennas belong to (uint32).
+    ids : np.ndarray
+        The public ids of the antennas (int64), their row number if not
+        given. The rows of the same antenna in different versions share its
+        id, which is kept when the antenna is updated.
+    index : GridIndex
+        The spatial index of the antennas, built from their coordinates if
+        not given. Only the indexed antennas are part of the store.
+    generation : int
+        The number of updates applied to the store since it was loaded, see
+        `LiveAntennaStore`.
+    """
+
+    versions: List[str]
+    x: np.ndarray
+    y: np.ndarray
+    operator: np.ndarray
+    generations: np.ndarray
+    membership: np.ndarray
+    ids: Union[np.ndarray, None] = None
+    index: Union[GridIndex, None] = None
+    generation: int = 0
+
+    def __post_init__(self):
+        if self.ids is None:
+            self.ids = np.arange(len(self.x), dtype=np.int64)
+        if self.index is None:
+            self.index = GridIndex(
+                self.x, self.y, cell_size=APP.SPATIAL_INDEX_CELL_KM * 1000
+            )
+
+    @property
+    def default_version(self) -> str:
+        return self.versions[-1]
+
+    def version_bit(self, version: Union[str, None] = None) -> int:
+        """Return the membership bit of a version, the default version if
+        None.
+
+        Raises
+        ------
+        ValueError
+            If the version is not loaded
+        """
+        if version is None:
+            version = self.default_version
+        if version not in self.versions:
+            raise ValueError(f"Version {version} not found")
+        return 1 << self.versions.index(version)
+
+    def contains(self, row: int) -> bool:
+        """Whether the antenna stored at a row is part of the store."""
+        return 0 <= row < len(self.x) and self.index.contains(
+            self.x[row], self.y[row], row
+        )
+
+    def antenna(self, row: int) -> Dict[str, Any]:
+        """Return the fields of the antenna stored at a row.
+
+        Raises
+        ------
+        AntennaNotFoundError
+            If the antenna is not in the store
+        """
+        if not self.contains(row):
+            raise AntennaNotFoundError(f"Antenna at row {row} not found")
+
+        operator = int(self.operator[row])
+        generations = int(self.generations[row])
+        membership = int(self.membership[row])
+        return {
+            "id": int(self.ids[row]),
+            "operator": (
+                OPERATORS[operator] if operator != UNKNOWN_OPERATOR else None
+            ),
+            "x": int(self.x[row]),
+            "y": int(self.y[row]),
+            **{
+                generation.value: bool(
+                    generations & generation_bit(generation)
+                )
+                for generation in GENERATIONS
+            },
+            "versions": [
+                version
+                for bit, version in enumerate(self.versions)
+                if membership & 1 << bit
+            ],
+        }
+
+    @classmethod
+    def from_geo_dfs(
+        cls, datasets: Dict[str, gpd.GeoDataFrame]
+    ) -> "AntennaStore":
+        """Build the store of several versions of the antennas data.
+
+        Parameters
+        ----------
+        datasets : Dict[str, gpd.GeoDataFrame]
+            The antennas of each version, from the oldest to the default one.
+            Each geo dataframe must contain a column for each generation with
+            1 if the antenna supports the generation, 0 otherwise, and a
+            column for the operator.
+
+        Returns
+        -------
+        AntennaStore
+            The store of the antennas of all the versions.
+
+        Raises
+        ------
+        ValueError
+            If there are no datasets or too many of them
+        """
+        if not 0 < len(datasets) <= MAX_VERSIONS:
+            raise ValueError(
+                f"Between 1 and {MAX_VERSIONS} datasets are supported, "
+                f"got {len(datasets)}"
+            )
+
+        frames = []
+        for bit, antennas_geo_df in enumerate(datasets.values()):
+            operator = pd.Categorical(
+                antennas_geo_df[Columns.OPERATOR],
+                categories=[op.value for op in OPERATORS],
+            )
+            generations = np.zeros(len(antennas_geo_df), dtype=np.uint8)
+            for generation in GENERATIONS:
+                supported = antennas_geo_df[generation].to_numpy() == 1
+                generations |= supported * np.uint8(generation_bit(generation))
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "x": antennas_geo_df.geometry.x.round(),
+                        "y": antennas_geo_df.geometry.y.round(),
+                        "operator": operator.codes,
+                        "generations": generations,
+                        "membership": 1 << bit,
+                    }
+                )
+            )
+
+        # Antennas identical in several versions are merged into one, the
+        # sum of their distinct version bits being the union of the bits
+        keys = ["x", "y", "operator", "generations"]
+        antennas_df = (
+            pd.concat(frames, ignore_index=True)
+            .drop_duplicates()
+            .groupby(keys, sort=False, as_index=False)["membership"]
+            .sum()
+        )
+        keys = hilbert_keys(
+            antennas_df["x"].to_numpy(),
+            antennas_df["y"].to_numpy(),
+            METROPOLITAN_BOUNDS,
+        )
+        antennas_df = antennas_df.iloc[np.argsort(keys, kind="stable")]
+
+        return cls(
+            versions=list(datasets),
+            x=antennas_df["x"].to_numpy(dtype=np.int32),
+            y=antennas_df["y"].to_numpy(dtype=np.int32),
+            operator=antennas_df["operator"].to_numpy(dtype=np.int8),
+            generations=antennas_df["generations"].to_numpy(dtype=np.uint8),
+            membership=antennas_df["membership"].to_numpy(dtype=np.uint32),
+        )
+
+
+class LiveAntennaStore:
+    """Antenna store updated online, one antenna at a time.
+
+    Readers work on immutable snapshots, taken with `snapshot`, so a query
+    never sees an update half applied. Updates are copy-on-write: an antenna
+    is never modified in place, it is replaced by a new row appended to the
+    columns, and a new snapshot is published whose spatial index only
+    rebuilds the cells of the rows added and removed.
+
+    The columns are allocated with spare capacity so that appending a row
+    does not copy them: the snapshots are views of the first rows of the
+    columns, which they share.
+
+    An antenna keeps its id across updates: the rows written for an id are
+    recorded, and the rows of the id in a snapshot are the ones it indexes.
+
+    The data derived from the antennas, e.g. the commune coverage table, is
+    kept up to date by the listeners added with `subscribe`.
+
+    Parameters
+    ----------
+    store : AntennaStore
+        The initial antennas.
+    """
+
+    def __init__(self, store: AntennaStore):
+        self._snapshot = store
+        self._size = len(store.x)
+        self._columns = {name: getattr(store, name) for name in COLUMNS}
+        # Rows are only ever added to the lists, each update replacing the
+        # list of the id so that readers never see a list being modified
+        self._rows: Dict[int, List[int]] = {}
+        for row, antenna_id in enumerate(store.ids.tolist()):
+            self._rows.setdefault(antenna_id, []).append(row)
+        self._next_id = int(store.ids.max()) + 1 if len(store.ids) else 0
+        self._listeners: List[
+            Callable[[AntennaStore, Union[np.ndarray, None]], None]
+        ] = []
+        self._lock = threading.Lock()
+
+    @property
+    def versions(self) -> List[str]:
+        return self._snapshot.versions
+
+    def snapshot(self) -> AntennaStore:
+        """Return the current state of the store, unaffected by the updates
+        applied afterwards."""
+        return self._snapshot
+
+    def subscribe(
+        self,
+        listener: Callable[[AntennaStore, Union[np.ndarray, None]], None],
+    ) -> None:
+        """Call a function on each update of the store, before its snapshot
+        is published, with the new snapshot and the rows of the antennas
+        added and removed.
+
+        If the store was already updated, the function is first called with
+        the current snapshot and None rows, the antennas changed since they
+        were loaded being unknown.
+
+        A failing listener does not fail the update: its data is left behind
+        the `generation` of the store.
+        """
+        with self._lock:
+            if self._snapshot.generation:
+                self._notify(listener, self._snapshot, None)
+            self._listeners.append(listener)
+
+    def get(
+        self, antenna_id: int, version: Union[str, None] = None
+    ) -> Dict[str, Any]:
+        """Return an antenna of the store as it is in a version of the data.
+        If no version is given, it is the antenna of the default version, or
+        of the last version it was written to if it is not in the default
+        one.
+
+        Raises
+        ------
+        AntennaNotFoundError
+            If the antenna is not in the store, or not in the given version
+        """
+        snapshot = self._snapshot
+        row = self._row(snapshot, antenna_id, version)
+        if row is None:
+            if version is not None:
+                raise AntennaNotFoundError(
+                    f"Antenna {antenna_id} not found in version {version}"
+                )
+            row = self._rows_in(snapshot, antenna_id)[-1]
+        return snapshot.antenna(row)
+
+    def insert(
+        self, antenna: Dict[str, Any], version: Union[str, None] = None
+    ) -> int:
+        """Add an antenna to a version of the data.
+
+        Parameters
+        ----------
+        antenna : Dict[str, Any]
+            The "operator", "x", "y" and generations ("2G", "3G", "4G") of
+            the antenna.
+        version : Union[str, None]
+            The version of the antennas data to update, the default one if
+            None.
+
+        Returns
+        -------
+        int
+            The id of the new antenna.
+        """
+        with self._lock:
+            version_bit = self._snapshot.version_bit(version)
+            antenna_id = self._next_id
+            self._next_id += 1
+            row = self._append(
+                {**antenna, "id": antenna_id, "membership": version_bit}
+            )
+            self._publish(added=[row], removed=[])
+        return antenna_id
+
+    def remove(self, antenna_id: int, version: Union[str, None] = None):
+        """Remove an antenna from a version of the data. It is kept in the
+        other versions it belongs to.
+
+        Raises
+        ------
+        AntennaNotFoundError
+            If the antenna is not in the version
+        """
+        self.update(antenna_id, None, version)
+
+    def update(
+        self,
+        antenna_id: int,
+        changes: Union[Dict[str, Any], None],
+        version: Union[str, None] = None,
+    ) -> Union[int, None]:
+        """Change some fields of an antenna in a version of the data. It is
+        unchanged in the other versions it belongs to.
+
+        Parameters
+        ----------
+        antenna_id : int
+            The id of the antenna.
+        changes : Union[Dict[str, Any], None]
+            The new values of the fields to change, see `insert`, or None to
+            remove the antenna from the version.
+        version : Union[str, None]
+            The version of the antennas data to update, the default one if
+            None.
+
+        Returns
+        -------
+        Union[int, None]
+            The id of the antenna, unchanged, or None if it was removed.
+
+        Raises
+        ------
+        AntennaNotFoundError
+            If the antenna is not in the version
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            version_bit = snapshot.version_bit(version)
+            row = self._row(snapshot, antenna_id, version)
+            if row is None:
+                raise AntennaNotFoundError(
+                    f"Antenna {antenna_id} not found in version "
+                    f"{version or snapshot.default_version}"
+                )
+            antenna = snapshot.antenna(row)
+            membership = int(snapshot.membership[row])
+
+            added = []
+            if membership & ~version_bit:
+                # Keep the antenna as it is in the other versions
+                added.append(
+                    self._append(
+                        {**antenna, "membership": membership & ~version_bit}
+                    )
+                )
+            if changes is not None:
+                added.append(
+                    self._append(
+                        {**antenna, **changes, "membership": version_bit}
+                    )
+                )
+            self._publish(added=added, removed=[row])
+        return antenna_id if changes is not None else None
+
+    def _rows_in(self, snapshot: AntennaStore, antenna_id: int) -> List[int]:
+        """Return the rows of an antenna in a snapshot.
+
+        Raises
+        ------
+        AntennaNotFoundError
+            If the antenna is not in the snapshot
+        """
+        rows = [
+            row
+            for row in self._rows.get(antenna_id, [])
+            if snapshot.contains(row)
+        ]
+        if not rows:
+            raise AntennaNotFoundError(f"Antenna {antenna_id} not found")
+        return rows
+
+    def _row(
+        self,
+        snapshot: AntennaStore,
+        antenna_id: int,
+        version: Union[str, None],
+    ) -> Union[int, None]:
+        """Return the row of an antenna in a version of a snapshot, the
+        default version if None, or None if it is not in the version.
+
+        Raises
+        ------
+        AntennaNotFoundError
+            If the antenna is not in the snapshot
+        """
+        version_bit = snapshot.version_bit(version)
+        for row in self._rows_in(snapshot, antenna_id):
+            if snapshot.membership[row] & version_bit:
+                return row
+        return None
+
+    def _append(self, antenna: Dict[str, Any]) -> int:
+        """Write an antenna after the last row of the columns, growing them if
+        needed, and return its row. It is not visible until published."""
+        if self._size == len(self._columns["x"]):
+            capacity = max(2 * self._size, 1024)
+            for name, column in self._columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[: self._size] = column[: self._size]
+                self._columns[name] = grown
+
+        operator = antenna["operator"]
+        generations = 0
+        for generation in GENERATIONS:
+            if antenna[generation]:
+                generations |= generation_bit(generation)
+
+        row = self._size
+        self._columns["x"][row] = antenna["x"]
+        self._columns["y"][row] = antenna["y"]
+        self._columns["operator"][row] = (
+            OPERATORS.index(operator) if operator else UNKNOWN_OPERATOR
+        )
+        self._columns["generations"][row] = generations
+        self._columns["membership"][row] = antenna["membership"]
+        self._columns["ids"][row] = antenna["id"]
+        self._rows[antenna["id"]] = [*self._rows.get(antenna["id"], []), row]
+        self._size += 1
+        return row
+
+    def _publish(self, added: List[int], removed: List[int]) -> None:
+        columns = {
+            name: column[: self._size]
+            for name, column in self._columns.items()
+        }
+        index = self._snapshot.index.updated(
+            columns["x"],
+            columns["y"],
+            added=np.array(added, dtype=np.int64),
+            removed=np.array(removed, dtype=np.int64),
+        )
+        snapshot = replace(
+            self._snapshot,
+            **columns,
+            index=index,
+            generation=self._snapshot.generation + 1,
+        )
+        rows = np.array(added + removed, dtype=np.int64)
+        for listener in self._listeners:
+            self._notify(listener, snapshot, rows)
+        self._snapshot = snapshot
+
+    @staticmethod
+    def _notify(
+        listener: Callable[[AntennaStore, Union[np.ndarray, None]], None],
+        snapshot: AntennaStore,
+        rows: Union[np.ndarray, None],
+    ) -> None:
+        try:
+            listener(snapshot, rows)
+        except Exception:
+            logger.exception("Antenna store listener %s failed", listener)
@@ -0,0 +1,178 @@
+"""Benchmark of the coverage of large batches of locations.
+
+Compares the throughput of:
+- the per-location path (`coverage`), with the locations in random order and
+  sorted along a Hilbert curve, on a sample of the batch,
+- the batch path (`coverage_batch`), with the antennas of the store in
+  random order and along a Hilbert curve, on the whole batch,
+- the same batch path with its sort of the locations along the Hilbert curve
+  turned off, on the whole batch, which isolates the gain of the sort: its
+  runs of locations in the same cell are then mostly single locations.
+
+The locations are drawn around the antennas of the default dataset, where
+the addresses are.
+
+Example:
+    python -m benchmarks.batch_coverage --points 1000000
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+
+from app.constants import METROPOLITAN_BOUNDS
+from app.load_data import load_store
+from app.services import (
+    CoverageQuery,
+    _coverage_batch,
+    coverage,
+    coverage_batch,
+)
+from app.spatial import hilbert_keys
+from app.store import COLUMNS, AntennaStore
+
+# All the generations and operators, with the default version and radii
+QUERY = CoverageQuery()
+
+
+def random_locations(
+    store: AntennaStore, count: int, spread: float, seed: int
+) -> np.ndarray:
+    """Draw locations around random antennas of the store, at a normal
+    distance of standard deviation `spread` meters."""
+    rng = np.random.default_rng(seed)
+    antennas = rng.integers(0, len(store.x), count)
+    return np.column_stack(
+        (
+            store.x[antennas] + rng.normal(0, spread, count),
+            store.y[antennas] + rng.normal(0, spread, count),
+        )
+    )
+
+
+def shuffled(store: AntennaStore, seed: int) -> AntennaStore:
+    """Return the store with its antennas in random order."""
+    permutation = np.random.default_rng(seed).permutation(len(store.x))
+    return AntennaStore(
+        versions=store.versions,
+        **{name: getattr(store, name)[permutation] for name in COLUMNS},
+    )
+
+
+def per_location(store: AntennaStore, locations: np.ndarray) -> None:
+    for x, y in locations:
+        coverage(x, y, store, QUERY)
+
+
+def batch(store: AntennaStore, locations: np.ndarray) -> None:
+    coverage_batch(locations[:, 0], locations[:, 1], store, QUERY)
+
+
+def unsorted_batch(store: AntennaStore, locations: np.ndarray) -> None:
+    _coverage_batch(locations[:, 0], locations[:, 1], store, QUERY, sort=False)
+
+
+def measure(
+    name: str,
+    run: Callable[[AntennaStore, np.ndarray], None],
+    store: AntennaStore,
+    locations: np.ndarray,
+    repeat: int,
+) -> Dict[str, Union[str, float]]:
+    """Return the best throughput of a run over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(store, locations)
+        best = min(best, time.perf_counter() - start)
+    result = {
+        "name": name,
+        "locations": len(locations),
+        "seconds": round(best, 3),
+        "locations_per_s": round(len(locations) / best, 1),
+    }
+    print(
+        f"{name:<40} {len(locations):>9} {best:>9.2f}s "
+        f"{result['locations_per_s']:>12.0f}/s"
+    )
+    return result
+
+
+def main(args: argparse.Namespace) -> List[Dict[str, Union[str, float]]]:
+    # Per location coverage logs are not part of the measure
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    store = load_store()
+    random_store = shuffled(store, args.seed)
+    locations = random_locations(store, args.points, args.spread, args.seed)
+    sample = locations[: args.sample]
+    sorted_sample = sample[
+        np.argsort(
+            hilbert_keys(sample[:, 0], sample[:, 1], METROPOLITAN_BOUNDS)
+        )
+    ]
+
+    print(f"{'':<40} {'locations':>9} {'time':>10} {'throughput':>14}")
+    results = [
+        measure("per location", per_location, store, sample, 1),
+        measure(
+            "per location, sorted locations",
+            per_location,
+            store,
+            sorted_sample,
+            1,
+        ),
+        measure(
+            "batch, antennas in random order",
+            batch,
+            random_store,
+            locations,
+            args.repeat,
+        ),
+        measure(
+            "batch, unsorted locations", unsorted_batch, store, locations, 1
+        ),
+        measure("batch", batch, store, locations, args.repeat),
+    ]
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump({"args": vars(args), "runs": results}, file, indent=2)
+        print(f"\nResults saved to {args.output}")
+    return results
+
+
+def parse_args(argv: Union[List[str], None] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the coverage of large batches of locations."
+    )
+    parser.add_argument(
+        "--points", type=int, default=1_000_000, help="Size of the batch."
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=20_000,
+        help="Number of locations of the per location runs.",
+    )
+    parser.add_argument(
+        "--spread",
+        type=float,
+        default=5_000,
+        help="Standard deviation of the distance of the locations to the "
+        "antennas, in meters.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to save the results to.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(parse_args())
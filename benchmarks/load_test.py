@@ -0,0 +1,425 @@
+"""Load test of the `/coverage` endpoint against a local stub of the address
+API.
+
+For each number of workers, the API is started with uvicorn, its address API
+pointing to the stub, and receives `/coverage` requests at a fixed rate for
+each batch size, or the payloads of a sample file replayed as they are.
+Throughput, latency percentiles and error rates are printed and saved as JSON
+so that builds can be compared.
+
+Example:
+    python -m benchmarks.load_test --workers 1 2 --batch-sizes 1 10 \\
+        --rate 20 --duration 10 --stub-latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Union
+
+import httpx
+import numpy as np
+
+from benchmarks.stub_api_address import StubSettings
+
+HOST = "127.0.0.1"
+SAMPLE_PAYLOADS_PATH = "benchmarks/resources/requests.jsonl"
+HOUSE_NUMBER_PATTERN = re.compile(r"^\s*\d+")
+
+
+@dataclass
+class Sample:
+    """Outcome of one `/coverage` request."""
+
+    latency: float
+    status: Union[int, None]
+    addresses: int = 1
+
+
+@dataclass
+class RunResult:
+    """Summary of the requests sent for one configuration. The batch size is
+    0 when the sample payloads are replayed as they are."""
+
+    workers: int
+    batch_size: int
+    target_rate: float
+    duration: float
+    requests: int
+    throughput_rps: float
+    addresses_per_s: float
+    latency_ms: Dict[str, float]
+    error_rate: float
+    status_counts: Dict[str, int]
+
+
+def load_payloads(path: str = SAMPLE_PAYLOADS_PATH) -> List[Dict[str, str]]:
+    """Read a JSON Lines file of `/coverage` payloads, one payload per
+    line."""
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def load_addresses(path: str = SAMPLE_PAYLOADS_PATH) -> List[str]:
+    """Read the addresses of a JSON Lines file of `/coverage` payloads."""
+    return [
+        address
+        for payload in load_payloads(path)
+        for address in payload.values()
+    ]
+
+
+def replay_payloads(
+    payloads: List[Dict[str, str]], count: int
+) -> List[Dict[str, str]]:
+    """Return `count` payloads cycling through the sample payloads, sent as
+    they are."""
+    return [payloads[i % len(payloads)] for i in range(count)]
+
+
+def make_payloads(
+    addresses: List[str], batch_size: int, count: int, seed: int = 0
+) -> List[Dict[str, str]]:
+    """Build `count` payloads of `batch_size` addresses drawn from the sample
+    addresses. A random house number is prepended to the drawn addresses
+    without one, so that batches do not keep repeating the exact same
+    addresses."""
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(count):
+        drawn = rng.choice(addresses, size=batch_size)
+        numbers = rng.integers(1, 200, size=batch_size)
+        payloads.append(
+            {
+                f"id{i}": (
+                    address
+                    if HOUSE_NUMBER_PATTERN.match(address)
+                    else f"{number} {address}"
+                )
+                for i, (number, address) in enumerate(
+                    zip(numbers, drawn, strict=True)
+                )
+            }
+        )
+    return payloads
+
+
+def summarize(
+    samples: List[Sample],
+    workers: int,
+    batch_size: int,
+    target_rate: float,
+    elapsed: float,
+) -> RunResult:
+    """Compute the throughput, latency percentiles and error rate of a run.
+    The statistics of a run without requests are all 0."""
+    succeeded = [s for s in samples if s.status == httpx.codes.OK]
+    status_counts: Dict[str, int] = {}
+    for sample in samples:
+        key = str(sample.status) if sample.status else "connection error"
+        status_counts[key] = status_counts.get(key, 0) + 1
+
+    latency_ms = dict.fromkeys(["p50", "p95", "p99", "mean", "max"], 0.0)
+    if samples:
+        latencies = np.array([sample.latency for sample in samples]) * 1000
+        latency_ms = {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+            "mean": round(float(latencies.mean()), 3),
+            "max": round(float(latencies.max()), 3),
+        }
+    addresses = sum(sample.addresses for sample in succeeded)
+
+    return RunResult(
+        workers=workers,
+        batch_size=batch_size,
+        target_rate=target_rate,
+        duration=round(elapsed, 3),
+        requests=len(samples),
+        throughput_rps=round(len(succeeded) / elapsed, 3) if elapsed else 0,
+        addresses_per_s=round(addresses / elapsed, 3) if elapsed else 0,
+        latency_ms=latency_ms,
+        error_rate=(
+            round(1 - len(succeeded) / len(samples), 4) if samples else 0
+        ),
+        status_counts=status_counts,
+    )
+
+
+async def _send(
+    client: httpx.AsyncClient, url: str, payload: Dict[str, str]
+) -> Sample:
+    start = time.perf_counter()
+    try:
+        response = await client.post(url, json=payload)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    return Sample(
+        latency=time.perf_counter() - start,
+        status=status,
+        addresses=len(payload),
+    )
+
+
+async def run_load(
+    url: str,
+    payloads: List[Dict[str, str]],
+    rate: float,
+    timeout: float,
+) -> List[Sample]:
+    """Send the payloads to `url` at a fixed rate, without waiting for the
+    previous responses (open loop), and return the outcome of each request.
+    """
+    loop = asyncio.get_running_loop()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        start = loop.time()
+        tasks = []
+        for i, payload in enumerate(payloads):
+            await asyncio.sleep(max(0.0, start + i / rate - loop.time()))
+            tasks.append(asyncio.create_task(_send(client, url, payload)))
+        return await asyncio.gather(*tasks)
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server {url} exited before being ready")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:  # noqa: PLR2004
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Server {url} not ready after {timeout}s")
+
+
+@contextmanager
+def serve(
+    app: str, port: int, workers: int, env: Dict[str, str]
+) -> Iterator[str]:
+    """Run an ASGI app with uvicorn in a subprocess and yield its URL."""
+    url = f"http://{HOST}:{port}"
+    process = subprocess.Popen(  # noqa: S603 (trusted arguments)
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            app,
+            "--host",
+            HOST,
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env={**os.environ, **env},
+    )
+    try:
+        _wait_until_ready(f"{url}/openapi.json", process, timeout=120)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def print_results(results: List[RunResult]) -> None:
+    print(
+        f"{'workers':>7} {'batch':>5} {'rate':>6} {'req/s':>8} "
+        f"{'addr/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'errors':>7}"
+    )
+    for result in results:
+        print(
+            f"{result.workers:>7} {result.batch_size or 'as is':>5} "
+            f"{result.target_rate:>6g} {result.throughput_rps:>8.1f} "
+            f"{result.addresses_per_s:>8.1f} "
+            f"{result.latency_ms['p50']:>8.1f} "
+            f"{result.latency_ms['p95']:>8.1f} "
+            f"{result.latency_ms['p99']:>8.1f} "
+            f"{result.error_rate:>7.2%}"
+        )
+
+
+def compare(results: List[RunResult], baseline_path: str) -> None:
+    """Print the throughput and p95 latency changes of the runs compared to
+    the same configurations of a previous results file."""
+    with open(baseline_path) as file:
+        baseline = {
+            (run["workers"], run["batch_size"], run["target_rate"]): run
+            for run in json.load(file)["runs"]
+        }
+    print(f"\nCompared to {baseline_path}:")
+    for result in results:
+        key = (result.workers, result.batch_size, result.target_rate)
+        if key not in baseline:
+            continue
+        before = baseline[key]
+        print(
+            f"workers={result.workers} batch={result.batch_size}: "
+            f"req/s {before['throughput_rps']:.1f} -> "
+            f"{result.throughput_rps:.1f}, p95 "
+            f"{before['latency_ms']['p95']:.1f} -> "
+            f"{result.latency_ms['p95']:.1f} ms"
+        )
+
+
+def main(args: argparse.Namespace) -> None:
+    stub_settings = StubSettings(
+        latency_ms=args.stub_latency_ms,
+        jitter_ms=args.stub_jitter_ms,
+        sigma=args.stub_sigma,
+        distribution=args.stub_distribution,
+        error_rate=args.stub_error_rate,
+        throttle_rate=args.stub_throttle_rate,
+        not_found_rate=args.stub_not_found_rate,
+    )
+    sample_payloads = load_payloads(args.payloads)
+    addresses = load_addresses(args.payloads)
+    count = int(args.rate * args.duration)
+    batch_sizes = [0] if args.replay else args.batch_sizes
+
+    results = []
+    with serve(
+        "benchmarks.stub_api_address:app",
+        args.stub_port,
+        workers=1,
+        env=stub_settings.to_env(),
+    ) as stub_url:
+        for workers in args.workers:
+            app_env = {
+                "API_ADDRESS_URL": stub_url,
+                "API_ADDRESS_RATE_LIMIT": str(args.address_rate_limit),
+                "GEOCODER": "api",
+            }
+            with serve(
+                "app.main:app", args.port, workers=workers, env=app_env
+            ) as app_url:
+                for batch_size in batch_sizes:
+                    payloads = (
+                        make_payloads(addresses, batch_size, count)
+                        if batch_size
+                        else replay_payloads(sample_payloads, count)
+                    )
+                    start = time.perf_counter()
+                    samples = asyncio.run(
+                        run_load(
+                            f"{app_url}/coverage",
+                            payloads,
+                            rate=args.rate,
+                            timeout=args.timeout,
+                        )
+                    )
+                    results.append(
+                        summarize(
+                            samples,
+                            workers=workers,
+                            batch_size=batch_size,
+                            target_rate=args.rate,
+                            elapsed=time.perf_counter() - start,
+                        )
+                    )
+                    print_results(results[-1:])
+
+    print()
+    print_results(results)
+    if args.baseline:
+        compare(results, args.baseline)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(
+            {
+                "label": args.label,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "stub": asdict(stub_settings),
+                "runs": [asdict(result) for result in results],
+            },
+            file,
+            indent=2,
+        )
+    print(f"\nResults saved to {args.output}")
+
+
+def parse_args(argv: Union[List[str], None] = None) -> argparse.Namespace:
+    now = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    parser = argparse.ArgumentParser(
+        description="Load test the /coverage endpoint."
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 10],
+        help="Numbers of addresses per payload drawn from the sample file.",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Send the payloads of the sample file as they are, in a loop, "
+        "instead of drawing batches of addresses from it.",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=10, help="Requests per second."
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds per run."
+    )
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument(
+        "--payloads",
+        default=SAMPLE_PAYLOADS_PATH,
+        help="JSON Lines file of /coverage payloads to replay or to draw "
+        "addresses from.",
+    )
+    parser.add_argument("--port", type=int, default=8105)
+    parser.add_argument("--stub-port", type=int, default=8106)
+    parser.add_argument(
+        "--address-rate-limit",
+        type=float,
+        default=1000,
+        help="API_ADDRESS_RATE_LIMIT of the API under test.",
+    )
+    parser.add_argument("--stub-latency-ms", type=float, default=50)
+    parser.add_argument("--stub-jitter-ms", type=float, default=20)
+    parser.add_argument("--stub-sigma", type=float, default=0.5)
+    parser.add_argument(
+        "--stub-distribution",
+        choices=["fixed", "uniform", "lognormal"],
+        default="lognormal",
+    )
+    parser.add_argument("--stub-error-rate", type=float, default=0)
+    parser.add_argument("--stub-throttle-rate", type=float, default=0)
+    parser.add_argument("--stub-not-found-rate", type=float, default=0)
+    parser.add_argument("--label", default=now, help="Name of the build.")
+    parser.add_argument("--output", default=f".reports/load_test_{now}.json")
+    parser.add_argument(
+        "--baseline", help="Previous results file to compare to."
+    )
+    args = parser.parse_args(argv)
+    if args.rate * args.duration < 1:
+        parser.error("--rate times --duration must be at least 1 request")
+    if not args.replay and min(args.batch_sizes) < 1:
+        parser.error("--batch-sizes must be positive")
+    return args
+
+
+if __name__ == "__main__":
+    main(parse_args())
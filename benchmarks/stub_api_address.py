@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
+
+# Addresses are spread over a box of mainland France, in Lambert 93
+X_RANGE = (400_000, 950_000)
+Y_RANGE = (6_350_000, 6_950_000)
+
+
+@dataclass(frozen=True)
+class StubSettings:
+    """Behaviour of the stub of the address API.
+
+    Attributes
+    ----------
+    latency_ms : float
+        The median latency of a response, in milliseconds.
+    jitter_ms : float
+        The half width of the latency range of the "uniform" distribution.
+    sigma : float
+        The standard deviation of the log of the latency of the "lognormal"
+        distribution.
+    distribution : str
+        The latency distribution: "fixed", "uniform" or "lognormal".
+    error_rate : float
+        The share of responses failing with a 500 status.
+    throttle_rate : float
+        The share of responses throttled with a 429 status.
+    not_found_rate : float
+        The share of addresses not found.
+    seed : int
+        The seed of the random generator.
+    """
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    sigma: float = 0.5
+    distribution: str = "lognormal"
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    not_found_rate: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "StubSettings":
+        """Read the settings from the STUB_* environment variables, e.g.
+        STUB_LATENCY_MS=50."""
+        return cls(
+            **{
+                name: type(default)(os.environ[f"STUB_{name.upper()}"])
+                for name, default in cls().__dict__.items()
+                if f"STUB_{name.upper()}" in os.environ
+            }
+        )
+
+    def to_env(self) -> dict:
+        return {
+            f"STUB_{name.upper()}": str(value)
+            for name, value in self.__dict__.items()
+        }
+
+    def sample_latency(self, rng: np.random.Generator) -> float:
+        """Draw the latency of a response, in seconds."""
+        if self.distribution == "fixed":
+            latency = self.latency_ms
+        elif self.distribution == "uniform":
+            latency = rng.uniform(
+                self.latency_ms - self.jitter_ms,
+                self.latency_ms + self.jitter_ms,
+            )
+        elif self.distribution == "lognormal":
+            if self.latency_ms <= 0:
+                # No median to spread the latencies around
+                return 0.0
+            latency = rng.lognormal(np.log(self.latency_ms), self.sigma)
+        else:
+            raise ValueError(
+                f"Latency distribution {self.distribution} not supported"
+            )
+        return max(latency, 0.0) / 1000
+
+
+def _feature(address: str) -> dict:
+    """A fake address API feature, with coordinates derived from the address
+    so that the same address is always found at the same place."""
+    digest = hashlib.sha256(address.encode()).digest()
+    u = int.from_bytes(digest[:4], "big") / 2**32
+    v = int.from_bytes(digest[4:8], "big") / 2**32
+    x = X_RANGE[0] + u * (X_RANGE[1] - X_RANGE[0])
+    y = Y_RANGE[0] + v * (Y_RANGE[1] - Y_RANGE[0])
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [0.0, 0.0]},
+        "properties": {
+            "label": address,
+            "score": 0.9,
+            "postcode": "75001",
+            "citycode": "75101",
+            "x": round(x, 2),
+            "y": round(y, 2),
+            "city": "Stub",
+            "type": "housenumber",
+        },
+    }
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    """Build the stub of the address API `/search/` endpoint."""
+    rng = np.random.default_rng(settings.seed)
+    app = FastAPI()
+
+    @app.get("/search/")
+    async def search(q: str, limit: int = 1):
+        await asyncio.sleep(settings.sample_latency(rng))
+
+        draw = rng.random()
+        if draw < settings.error_rate:
+            return JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={"detail": "Stub error"},
+            )
+        draw -= settings.error_rate
+        if draw < settings.throttle_rate:
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": "1"},
+            )
+        draw -= settings.throttle_rate
+        features = [] if draw < settings.not_found_rate else [_feature(q)]
+        return {
+            "type": "FeatureCollection",
+            "features": features[:limit],
+            "query": q,
+            "limit": limit,
+        }
+
+    return app
+
+
+app = create_app(StubSettings.from_env())
@@ -3,6 +3,20 @@ from unittest.mock import Mock, patch
 import pytest
 
 from app.api_address.client import APIAddressClient
+from app.api_address.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def rate_limiter() -> RateLimiter:
+    # A limiter per test, so that the 429 responses simulated by a test do
+    # not lower the concurrency of the shared limiter used by the others
+    return RateLimiter(
+        rate=1000,
+        burst=10,
+        initial_concurrency=10,
+        min_concurrency=1,
+        max_concurrency=10,
+    )
 
 
 @pytest.fixture
@@ -43,19 +57,70 @@ def result():
 
 
 @patch("requests.sessions.Session.send")
-def test_get_xy_from_address_ok(mock_send, result):
+def test_get_xy_from_address_ok(mock_send, result, rate_limiter):
     mock_send.return_value = Mock(json=lambda: result)
-    api_address_client = APIAddressClient()
+    api_address_client = APIAddressClient(rate_limiter=rate_limiter)
     x, y = api_address_client.get_xy_from_address("fake address")
     assert x == result["features"][0]["properties"]["x"]
     assert y == result["features"][0]["properties"]["y"]
 
 
 @patch("requests.sessions.Session.send")
-def test_get_xy_from_address_no_address_found(mock_send, result):
+def test_get_xy_from_address_no_address_found(mock_send, result, rate_limiter):
     result["features"] = []
     mock_send.return_value = Mock(json=lambda: result)
-    api_address_client = APIAddressClient()
+    api_address_client = APIAddressClient(rate_limiter=rate_limiter)
     x, y = api_address_client.get_xy_from_address("fake address")
     assert x is None
     assert y is None
+
+
+@patch("app.api_address.client.time.sleep")
+@patch("requests.sessions.Session.send")
+def test_get_xy_from_address_retry_when_throttled(
+    mock_send, mock_sleep, result, rate_limiter
+):
+    throttled = Mock(status_code=429, headers={"Retry-After": "2"})
+    mock_send.side_effect = [
+        throttled,
+        Mock(status_code=200, json=lambda: result),
+    ]
+    api_address_client = APIAddressClient(rate_limiter=rate_limiter)
+    x, y = api_address_client.get_xy_from_address("fake address")
+    assert x == result["features"][0]["properties"]["x"]
+    assert y == result["features"][0]["properties"]["y"]
+    mock_sleep.assert_called_once_with(2.0)
+
+
+@patch("app.api_address.client.time.sleep")
+@patch("requests.sessions.Session.send")
+def test_get_xy_from_address_still_throttled(
+    mock_send, mock_sleep, rate_limiter
+):
+    mock_send.return_value = Mock(status_code=429, headers={})
+    api_address_client = APIAddressClient(
+        rate_limiter=rate_limiter, max_retries=2
+    )
+    x, y = api_address_client.get_xy_from_address("fake address")
+    assert x is None
+    assert y is None
+    assert mock_send.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+@patch("requests.sessions.Session.send")
+def test_get_xy_and_citycode_from_address(mock_send, result, rate_limiter):
+    mock_send.return_value = Mock(json=lambda: result)
+    api_address_client = APIAddressClient(rate_limiter=rate_limiter)
+    x, y, citycode = api_address_client.get_xy_and_citycode_from_address(
+        "fake address"
+    )
+    assert (x, y) == api_address_client.get_xy_from_address("fake address")
+    assert citycode == "80021"
+    # One request per lookup
+    assert mock_send.call_count == 2
+
+    result["features"] = []
+    assert api_address_client.get_xy_and_citycode_from_address(
+        "fake address"
+    ) == (None, None, None)
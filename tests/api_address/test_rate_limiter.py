@@ -0,0 +1,135 @@
+import threading
+
+import pytest
+
+from app.api_address.rate_limiter import (
+    AdaptiveConcurrencyLimiter,
+    RateLimiter,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_token_bucket_burst_then_steady_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+
+    # The burst is served without waiting
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    # Then requests are paced at 10 per second
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert clock.now == pytest.approx(0.2)
+
+
+def test_token_bucket_refills_after_idle_period():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        bucket.acquire()
+
+    # The bucket never holds more than its capacity
+    clock.now += 10
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.1)
+
+
+def test_token_bucket_invalid_parameters():
+    with pytest.raises(ValueError, match="Rate must be positive"):
+        TokenBucket(rate=0, capacity=1)
+    with pytest.raises(ValueError, match="Capacity must be at least 1"):
+        TokenBucket(rate=1, capacity=0)
+
+
+def test_adaptive_concurrency_aimd():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=1, maximum=10)
+
+    # Multiplicative decrease on throttled responses
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(throttled=True)
+    assert limiter.limit == 1
+
+    # Additive increase on successful responses, up to the maximum
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 10
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_concurrency_cut_once_per_congestion_event():
+    limiter = AdaptiveConcurrencyLimiter(initial=10, minimum=1, maximum=10)
+    for _ in range(10):
+        limiter.acquire()
+
+    # A burst of in-flight requests all throttled cuts the limit once
+    for _ in range(10):
+        limiter.release(throttled=True)
+    assert limiter.limit == 5
+    assert limiter.in_flight == 0
+
+    # A 429 on a request sent after the cut is a new congestion event
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 2
+
+
+def test_adaptive_concurrency_concurrent_throttled_releases():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=1, maximum=10)
+    barrier = threading.Barrier(8)
+
+    def throttled_request():
+        limiter.acquire()
+        barrier.wait()
+        limiter.release(throttled=True)
+
+    threads = [threading.Thread(target=throttled_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_concurrency_invalid_parameters():
+    with pytest.raises(ValueError, match="Concurrency limits must satisfy"):
+        AdaptiveConcurrencyLimiter(initial=20, minimum=1, maximum=10)
+
+
+def test_rate_limiter_reports_queue_wait():
+    rate_limiter = RateLimiter(
+        rate=1000,
+        burst=1,
+        initial_concurrency=2,
+        min_concurrency=1,
+        max_concurrency=2,
+    )
+    for throttled in (False, True):
+        with rate_limiter.slot() as slot:
+            slot.throttled = throttled
+
+    assert rate_limiter.stats.requests == 2
+    assert rate_limiter.stats.max_wait > 0
+    assert rate_limiter.stats.mean_wait == pytest.approx(
+        rate_limiter.stats.total_wait / 2
+    )
+    assert rate_limiter.concurrency.limit == 1
+    assert rate_limiter.concurrency.in_flight == 0
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from benchmarks.load_test import (
+    Sample,
+    load_addresses,
+    load_payloads,
+    make_payloads,
+    parse_args,
+    replay_payloads,
+    summarize,
+)
+
+
+def test_load_addresses(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    path.write_text(
+        json.dumps({"id1": "a", "id2": "b"})
+        + "\n\n"
+        + json.dumps({"id1": "c"})
+    )
+
+    assert load_addresses(str(path)) == ["a", "b", "c"]
+    assert load_payloads(str(path)) == [{"id1": "a", "id2": "b"}, {"id1": "c"}]
+
+
+def test_replay_payloads():
+    payloads = load_payloads()
+
+    replayed = replay_payloads(payloads, count=len(payloads) + 2)
+
+    assert replayed == payloads + payloads[:2]
+
+
+def test_make_payloads():
+    payloads = make_payloads(["rue A", "rue B"], batch_size=3, count=4)
+
+    assert len(payloads) == 4
+    assert all(list(payload) == ["id0", "id1", "id2"] for payload in payloads)
+    assert all(
+        address.endswith(("rue A", "rue B"))
+        for payload in payloads
+        for address in payload.values()
+    )
+    # Payloads are reproducible
+    assert payloads == make_payloads(["rue A", "rue B"], 3, 4)
+
+
+def test_make_payloads_keeps_house_numbers():
+    payloads = make_payloads(
+        ["15 Grand Place 59800 Lille", "Place d'Armes, 78000 Versailles"],
+        batch_size=20,
+        count=1,
+    )
+
+    addresses = set(payloads[0].values())
+    assert "15 Grand Place 59800 Lille" in addresses
+    assert all(
+        address == "15 Grand Place 59800 Lille"
+        or address.split(" ", 1)[1] == "Place d'Armes, 78000 Versailles"
+        for address in addresses
+    )
+
+
+def test_summarize():
+    samples = [
+        Sample(latency=0.01 * i, status=200, addresses=5) for i in range(1, 9)
+    ]
+    samples += [Sample(latency=1.0, status=500), Sample(1.0, status=None)]
+
+    result = summarize(
+        samples, workers=2, batch_size=5, target_rate=10, elapsed=2.0
+    )
+
+    assert result.requests == 10
+    assert result.throughput_rps == 4.0
+    assert result.addresses_per_s == 20.0
+    assert result.error_rate == 0.2
+    assert result.status_counts == {
+        "200": 8,
+        "500": 1,
+        "connection error": 1,
+    }
+    assert result.latency_ms["p50"] == pytest.approx(55.0)
+    assert result.latency_ms["max"] == 1000.0
+
+
+def test_summarize_no_requests():
+    result = summarize(
+        [], workers=1, batch_size=1, target_rate=0.1, elapsed=0.0
+    )
+
+    assert result.requests == 0
+    assert result.throughput_rps == 0
+    assert result.error_rate == 0
+    assert result.latency_ms["p95"] == 0
+
+
+def test_parse_args():
+    assert parse_args(["--replay"]).replay is True
+    with pytest.raises(SystemExit):
+        parse_args(["--rate", "0.1", "--duration", "1"])
@@ -0,0 +1,61 @@
+import warnings
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_api_address import StubSettings, create_app
+
+
+def test_stub_returns_the_same_location_for_an_address():
+    client = TestClient(create_app(StubSettings(latency_ms=0)))
+
+    first = client.get("/search/", params={"q": "8 bd du Port"}).json()
+    second = client.get("/search/", params={"q": "8 bd du Port"}).json()
+
+    properties = first["features"][0]["properties"]
+    assert properties == second["features"][0]["properties"]
+    assert 400_000 <= properties["x"] <= 950_000
+    assert 6_350_000 <= properties["y"] <= 6_950_000
+
+
+@pytest.mark.parametrize(
+    ("settings", "status_code", "features"),
+    [
+        (StubSettings(latency_ms=0, error_rate=1), 500, None),
+        (StubSettings(latency_ms=0, throttle_rate=1), 429, None),
+        (StubSettings(latency_ms=0, not_found_rate=1), 200, []),
+    ],
+)
+def test_stub_failures(settings, status_code, features):
+    client = TestClient(create_app(settings))
+
+    response = client.get("/search/", params={"q": "8 bd du Port"})
+
+    assert response.status_code == status_code
+    if features is not None:
+        assert response.json()["features"] == features
+
+
+def test_stub_settings_round_trip_through_env(monkeypatch):
+    settings = StubSettings(latency_ms=10, distribution="fixed", seed=3)
+    for name, value in settings.to_env().items():
+        monkeypatch.setenv(name, value)
+
+    assert StubSettings.from_env() == settings
+
+
+def test_stub_latency_distributions():
+    rng = np.random.default_rng(0)
+
+    assert StubSettings(latency_ms=20, distribution="fixed").sample_latency(
+        rng
+    ) == pytest.approx(0.02)
+    # No latency, without sampling around log(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert StubSettings(latency_ms=0).sample_latency(rng) == 0
+    uniform = StubSettings(latency_ms=20, jitter_ms=5, distribution="uniform")
+    assert 0.015 <= uniform.sample_latency(rng) <= 0.025
+    with pytest.raises(ValueError, match="not supported"):
+        StubSettings(distribution="pareto").sample_latency(rng)
@@ -0,0 +1,131 @@
+import pytest
+
+from app.geocoder.ban import (
+    BANGeocoder,
+    build_ban_index,
+    normalize,
+    parse_address,
+    parse_city,
+)
+
+
+@pytest.fixture(scope="module")
+def geocoder(tmp_path_factory) -> BANGeocoder:
+    index_path = str(tmp_path_factory.mktemp("ban_index"))
+    build_ban_index("tests/resources/ban.csv", index_path, chunksize=3)
+    return BANGeocoder(index_path=index_path)
+
+
+def test_normalize():
+    assert normalize("Bd de l'Hôpital") == "boulevard de l hopital"
+    assert normalize("  Place  d'ARMES ") == "place d armes"
+    assert normalize("Rue du Cœur") == "rue du coeur"
+
+
+def test_parse_address():
+    assert parse_address("8 bis Bd du Port, 80000 Amiens") == (
+        "80000",
+        "boulevard du port",
+        "8bis",
+    )
+    assert parse_address("Place d'Armes, 78000 Versailles") == (
+        "78000",
+        "place d armes",
+        "",
+    )
+    assert parse_address("This is a fake address") == (None, None, None)
+
+
+def test_parse_city():
+    assert parse_city("8 bis Bd du Port, 80000 Amiens") == "amiens"
+    assert parse_city("1 rue de l'Eglise 01100 Village-B") == "village b"
+    assert parse_city("8 bis Bd du Port 80000") == ""
+    assert parse_city("This is a fake address") == ""
+
+
+def test_get_xy_from_address_exact_match(geocoder: BANGeocoder):
+    x, y = geocoder.get_xy_from_address("8 Boulevard du Port 80000 Amiens")
+    assert (x, y) == pytest.approx((648952.58, 6977867.25))
+
+    x, y = geocoder.get_xy_from_address("8 bis bd du port, 80000 AMIENS")
+    assert (x, y) == pytest.approx((648960.00, 6977870.00))
+
+    x, y = geocoder.get_xy_from_address("1 rue de Rivoli, 75001 Paris")
+    assert (x, y) == pytest.approx((651993.00, 6862354.00))
+
+
+def test_get_xy_from_address_fuzzy_match(geocoder: BANGeocoder):
+    # Typo in the street name
+    x, y = geocoder.get_xy_from_address("3 rue de l'Hopitale, 80000 Amiens")
+    assert (x, y) == pytest.approx((648000.00, 6978000.00))
+
+    # Unknown house number: the closest number of the street is returned
+    x, y = geocoder.get_xy_from_address("18 Boulevard du Port 80000 Amiens")
+    assert (x, y) == pytest.approx((649052.58, 6977967.25))
+
+    # No house number: the middle of the street is returned
+    x, y = geocoder.get_xy_from_address("Place d'Armes, 78000 Versailles")
+    assert (x, y) == pytest.approx((636050.00, 6856100.00))
+
+
+def test_get_xy_from_address_not_found(geocoder: BANGeocoder):
+    # Unknown street
+    assert geocoder.get_xy_from_address(
+        "1 avenue des Champs-Elysees, 75008 Paris"
+    ) == (None, None)
+    # Unknown postcode
+    assert geocoder.get_xy_from_address("1 rue de Rivoli, 75004 Paris") == (
+        None,
+        None,
+    )
+    # No postcode
+    assert geocoder.get_xy_from_address("This is a fake address") == (
+        None,
+        None,
+    )
+
+
+def test_get_xy_and_citycode_from_address(geocoder: BANGeocoder):
+    for address in [
+        "8 Boulevard du Port 80000 Amiens",
+        "Place d'Armes, 78000 Versailles",
+    ]:
+        x, y, _ = geocoder.get_xy_and_citycode_from_address(address)
+        assert (x, y) == geocoder.get_xy_from_address(address)
+    _, _, citycode = geocoder.get_xy_and_citycode_from_address(
+        "8 Boulevard du Port 80000 Amiens"
+    )
+    assert citycode == "80021"
+    _, _, citycode = geocoder.get_xy_and_citycode_from_address(
+        "Place d'Armes, 78000 Versailles"
+    )
+    assert citycode == "78646"
+    assert geocoder.get_xy_and_citycode_from_address(
+        "This is a fake address"
+    ) == (None, None, None)
+
+
+def test_get_xy_from_address_same_street_in_several_communes(
+    geocoder: BANGeocoder,
+):
+    # Village-A and Village-B share the postcode 01100 and both have a
+    # "Rue de l'Église": the city name of the address picks the commune
+    x, y = geocoder.get_xy_from_address("1 rue de l'Eglise 01100 Village-B")
+    assert (x, y) == pytest.approx((890000.00, 6550000.00))
+
+    x, y = geocoder.get_xy_from_address("Rue de l'Église, 01100 VILLAGE A")
+    assert (x, y) == pytest.approx((870050.00, 6570050.00))
+
+    # Fuzzy matched street and city
+    x, y = geocoder.get_xy_from_address("1 rue de l'Egliz 01100 Vilage-B")
+    assert (x, y) == pytest.approx((890000.00, 6550000.00))
+
+    # Without the city name the commune is ambiguous
+    assert geocoder.get_xy_from_address("1 rue de l'Eglise 01100") == (
+        None,
+        None,
+    )
+    _, _, citycode = geocoder.get_xy_and_citycode_from_address(
+        "1 rue de l'Eglise 01100 Village-B"
+    )
+    assert citycode == "01002"
@@ -0,0 +1,46 @@
+from unittest.mock import Mock
+
+from app.geocoder.base import FallbackGeocoder
+
+
+def test_fallback_geocoder_first_hit():
+    first = Mock(get_xy_from_address=Mock(return_value=(1.0, 2.0)))
+    second = Mock(get_xy_from_address=Mock(return_value=(3.0, 4.0)))
+    geocoder = FallbackGeocoder([first, second])
+
+    assert geocoder.get_xy_from_address("fake address") == (1.0, 2.0)
+    second.get_xy_from_address.assert_not_called()
+
+
+def test_fallback_geocoder_miss():
+    first = Mock(get_xy_from_address=Mock(return_value=(None, None)))
+    second = Mock(get_xy_from_address=Mock(return_value=(3.0, 4.0)))
+    geocoder = FallbackGeocoder([first, second])
+
+    assert geocoder.get_xy_from_address("fake address") == (3.0, 4.0)
+
+    second.get_xy_from_address.return_value = (None, None)
+    assert geocoder.get_xy_from_address("fake address") == (None, None)
+
+
+def test_fallback_geocoder_xy_and_citycode():
+    first = Mock(
+        get_xy_and_citycode_from_address=Mock(return_value=(None, None, None))
+    )
+    second = Mock(
+        get_xy_and_citycode_from_address=Mock(return_value=(3.0, 4.0, "80021"))
+    )
+    geocoder = FallbackGeocoder([first, second])
+
+    assert geocoder.get_xy_and_citycode_from_address("fake address") == (
+        3.0,
+        4.0,
+        "80021",
+    )
+
+    second.get_xy_and_citycode_from_address.return_value = (None, None, None)
+    assert geocoder.get_xy_and_citycode_from_address("fake address") == (
+        None,
+        None,
+        None,
+    )
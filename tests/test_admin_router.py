@@ -0,0 +1,180 @@
+from unittest.mock import patch
+
+import geopandas as gpd
+import pytest
+from fastapi.testclient import TestClient
+from shapely.geometry import Point
+
+from app.constants import PROJECTED_COORDINATE_SYSTEM as CRS
+from app.env import APP
+from app.main import app
+from app.store import AntennaStore, LiveAntennaStore
+
+TOKEN = "secret"  # noqa: S105
+
+
+@pytest.fixture
+def live_store():
+    geo_df = gpd.GeoDataFrame(
+        {
+            "Operateur": ["Orange"],
+            "2G": [1],
+            "3G": [1],
+            "4G": [0],
+            "geometry": [Point(648262, 6862198)],
+        },
+        crs=CRS,
+    )
+    live_store = LiveAntennaStore(
+        AntennaStore.from_geo_dfs({"default": geo_df})
+    )
+    with patch("app.admin_router.antennas_store", live_store):
+        yield live_store
+
+
+@pytest.fixture
+def client():
+    with patch.object(APP, "ADMIN_TOKEN", TOKEN):
+        yield TestClient(app, headers={"X-Admin-Token": TOKEN})
+
+
+@pytest.fixture
+def antenna():
+    return {
+        "id": 0,
+        "operator": "Orange",
+        "x": 648262,
+        "y": 6862198,
+        "2G": True,
+        "3G": True,
+        "4G": False,
+        "versions": ["default"],
+    }
+
+
+class TestAdminRouter:
+    def test_get_antenna(self, live_store, client, antenna):
+        with client as c:
+            response = c.get("/admin/antennas/0")
+            assert response.status_code == 200
+            assert response.json() == antenna
+
+            response = c.get("/admin/antennas/42")
+            assert response.status_code == 404
+            assert response.json()["detail"] == "Antenna 42 not found"
+
+    def test_search_antennas(self, live_store, client, antenna):
+        with client as c:
+            response = c.get(
+                "/admin/antennas",
+                params={"x": 648000, "y": 6862000, "radius_km": 1},
+            )
+            assert response.status_code == 200
+            assert response.json() == [antenna]
+
+            response = c.get(
+                "/admin/antennas",
+                params={"x": 600000, "y": 6862000, "radius_km": 1},
+            )
+            assert response.json() == []
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"x": "nan", "y": 6862000},
+            {"x": 648000, "y": 10**10},
+            {"x": 648000, "y": 6862000, "radius_km": 1e6},
+            {"x": 648000, "y": 6862000, "radius_km": 0},
+            {"x": 648000, "y": 6862000, "limit": 0},
+        ],
+    )
+    def test_search_antennas_invalid(self, live_store, client, params):
+        with client as c:
+            response = c.get("/admin/antennas", params=params)
+            assert response.status_code == 422
+
+    def test_insert_update_remove_antenna(self, live_store, client, antenna):
+        with client as c:
+            new_antenna = {**antenna, "operator": "Free", "4G": True}
+            del new_antenna["id"], new_antenna["versions"]
+            response = c.post("/admin/antennas", json=new_antenna)
+            assert response.status_code == 201
+            assert response.json() == {
+                **new_antenna,
+                "id": 1,
+                "versions": ["default"],
+            }
+
+            # The antenna keeps its id when updated
+            response = c.patch("/admin/antennas/1", json={"3G": False})
+            assert response.status_code == 200
+            assert response.json()["id"] == 1
+            assert response.json()["3G"] is False
+            assert c.get("/admin/antennas/1").json()["3G"] is False
+
+            response = c.delete("/admin/antennas/1")
+            assert response.status_code == 204
+            assert c.get("/admin/antennas/1").status_code == 404
+
+    @pytest.mark.parametrize(
+        "fields",
+        [
+            {"x": 10**10},
+            {"x": -5_000_000, "y": 0},
+            {"y": 8_000_000},
+        ],
+    )
+    def test_antenna_out_of_bounds(self, live_store, client, antenna, fields):
+        with client as c:
+            new_antenna = {**antenna, **fields}
+            del new_antenna["id"], new_antenna["versions"]
+            response = c.post("/admin/antennas", json=new_antenna)
+            assert response.status_code == 422
+
+            response = c.patch("/admin/antennas/0", json=fields)
+            assert response.status_code == 422
+            assert c.get("/admin/antennas/0").json() == antenna
+
+    @pytest.mark.parametrize(
+        "fields", [{"x": None}, {"operator": None}, {"2G": None}]
+    )
+    def test_update_antenna_null_field(
+        self, live_store, client, antenna, fields
+    ):
+        with client as c:
+            response = c.patch("/admin/antennas/0", json=fields)
+            assert response.status_code == 422
+            assert c.get("/admin/antennas/0").json() == antenna
+        # Nothing was written to the store
+        assert live_store.snapshot().generation == 0
+
+    def test_unknown_version(self, live_store, client):
+        with client as c:
+            response = c.delete("/admin/antennas/0?version=fake")
+            assert response.status_code == 422
+            assert response.json()["detail"] == "Version fake not found"
+
+    def test_admin_token(self, live_store, client):
+        with client as c:
+            response = c.get(
+                "/admin/antennas/0", headers={"X-Admin-Token": ""}
+            )
+            assert response.status_code == 401
+            response = c.get(
+                "/admin/antennas/0", headers={"X-Admin-Token": "wrong"}
+            )
+            assert response.status_code == 401
+            assert c.get("/admin/antennas/0").status_code == 200
+
+    def test_no_admin_token(self, live_store, antenna):
+        # The admin endpoints are closed when no token is configured
+        with TestClient(app) as c:
+            assert c.get("/admin/antennas/0").status_code == 403
+            response = c.delete(
+                "/admin/antennas/0", headers={"X-Admin-Token": ""}
+            )
+            assert response.status_code == 403
+            assert response.json()["detail"] == (
+                "Admin endpoints are disabled, no ADMIN_TOKEN is set"
+            )
+        assert live_store.get(0) == antenna
@@ -0,0 +1,232 @@
+from unittest.mock import Mock, patch
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import Point
+
+from app.communes import (
+    CommuneCoverageTable,
+    _load_commune_table,
+    build_commune_table,
+    get_commune_coverage_from_address,
+    get_commune_table,
+)
+from app.constants import PROJECTED_COORDINATE_SYSTEM as CRS
+from app.env import APP
+from app.radius import RadiusModel
+from app.services import CoverageQuery
+from app.store import AntennaStore, LiveAntennaStore
+
+
+@pytest.fixture(scope="module")
+def store() -> AntennaStore:
+    # Each operator has an antenna at the Eiffel Tower, about 4 km from the
+    # centroid of Paris, with different generations available
+    geo_df = gpd.GeoDataFrame(
+        {
+            "Operateur": ["Orange", "SFR", "Bouygues", "Free"],
+            "2G": [1, 0, 1, 0],
+            "3G": [1, 1, 0, 0],
+            "4G": [1, 1, 1, 1],
+            "geometry": [Point(648261.88, 6862197.96)] * 4,
+        },
+        crs=CRS,
+    )
+    return AntennaStore.from_geo_dfs({"v1": geo_df, "v2": geo_df})
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory, store: AntennaStore) -> CommuneCoverageTable:
+    table_path = str(tmp_path_factory.mktemp("commune_coverage"))
+    build_commune_table("tests/resources/communes.csv", table_path, store)
+    return CommuneCoverageTable(table_path)
+
+
+def test_build_commune_table(table: CommuneCoverageTable):
+    assert len(table) == 3
+    assert list(table.codes) == [b"2A004", b"75056", b"80021"]
+    assert table.version == "v2"
+    assert table.model == "default"
+
+
+def test_coverage(table: CommuneCoverageTable):
+    assert table.coverage("75056") == {
+        "Orange": {"2G": True, "3G": True, "4G": True},
+        "SFR": {"2G": False, "3G": True, "4G": True},
+        "Bouygues": {"2G": True, "3G": False, "4G": True},
+        "Free": {"2G": False, "3G": False, "4G": True},
+    }
+    # Amiens is out of the range of the antennas
+    assert not any(
+        covered
+        for generations in table.coverage("80021").values()
+        for covered in generations.values()
+    )
+    assert table.coverage("99999") is None
+
+
+def test_coverage_municipal_arrondissement(table: CommuneCoverageTable):
+    assert table.coverage("75101") == table.coverage("75056")
+    assert table.coverage("75120") == table.coverage("75056")
+    # Marseille is not in the table
+    assert table.coverage("13201") is None
+
+
+def test_commune_table_without_centroids(tmp_path, store: AntennaStore):
+    build_commune_table("tests/resources/communes.csv", str(tmp_path), store)
+    (tmp_path / "x.npy").unlink()
+
+    with pytest.raises(ValueError, match="has no centroids, rebuild it"):
+        CommuneCoverageTable(str(tmp_path))
+
+
+def test_commune_table_follows_live_store(tmp_path, store: AntennaStore):
+    build_commune_table("tests/resources/communes.csv", str(tmp_path), store)
+    table = CommuneCoverageTable(str(tmp_path))
+    live_store = LiveAntennaStore(store)
+    live_store.subscribe(table.update)
+    ajaccio = table.coverage("2A004")
+
+    # An antenna next to the centroid of Amiens
+    live_store.insert(
+        {
+            "operator": "Free",
+            "x": 648000,
+            "y": 6977000,
+            "2G": 0,
+            "3G": 0,
+            "4G": 1,
+        }
+    )
+
+    assert table.generation == 1
+    assert table.coverage("80021")["Free"]["4G"]
+    assert not table.coverage("80021")["Orange"]["4G"]
+    assert table.coverage("2A004") == ajaccio
+
+    # The Orange antenna of the Eiffel Tower is removed from the table
+    # version only
+    live_store.remove(0, version="v2")
+
+    assert table.generation == 2
+    assert table.coverage("75056")["Orange"] == {
+        "2G": False,
+        "3G": False,
+        "4G": False,
+    }
+    assert table.coverage("75056")["SFR"]["4G"]
+
+
+def test_commune_table_subscribed_after_updates(tmp_path, store: AntennaStore):
+    build_commune_table("tests/resources/communes.csv", str(tmp_path), store)
+    table = CommuneCoverageTable(str(tmp_path))
+    live_store = LiveAntennaStore(store)
+    live_store.remove(0)
+
+    live_store.subscribe(table.update)
+
+    assert table.generation == 1
+    assert not table.coverage("75056")["Orange"]["4G"]
+
+
+def test_commune_table_missed_update(tmp_path, store: AntennaStore):
+    build_commune_table("tests/resources/communes.csv", str(tmp_path), store)
+    table = CommuneCoverageTable(str(tmp_path))
+    live_store = LiveAntennaStore(store)
+    # The removal of the Orange antenna is not applied to the table
+    live_store.remove(0)
+    live_store.insert(
+        {"operator": "Free", "x": 0, "y": 0, "2G": 0, "3G": 0, "4G": 1}
+    )
+    snapshot = live_store.snapshot()
+
+    # The next update recomputes the whole table
+    table.update(snapshot, np.array([len(snapshot.x) - 1], dtype=np.int64))
+
+    assert table.generation == 2
+    assert not table.coverage("75056")["Orange"]["4G"]
+
+
+def test_get_commune_table_built_after_startup(tmp_path, store: AntennaStore):
+    live_store = LiveAntennaStore(store)
+    with patch.object(APP, "COMMUNE_TABLE_PATH", str(tmp_path)):
+        assert get_commune_table(live_store) is None
+
+        build_commune_table(
+            "tests/resources/communes.csv", str(tmp_path), store
+        )
+        table = get_commune_table(live_store)
+
+        assert len(table) == 3
+        assert get_commune_table(live_store) is table
+    _load_commune_table.cache_clear()
+
+
+def test_build_commune_table_radius_model(tmp_path, store: AntennaStore):
+    model = RadiusModel("short", {"2G": 1, "3G": 1, "4G": 1})
+    build_commune_table(
+        "tests/resources/communes.csv", str(tmp_path), store, "v1", model
+    )
+    table = CommuneCoverageTable(str(tmp_path))
+
+    assert (table.version, table.model) == ("v1", "short")
+    assert not table.coverage("75056")["Orange"]["4G"]
+
+
+@patch("app.communes.coverage")
+@patch("app.communes.get_geocoder")
+def test_get_commune_coverage_from_address(
+    mock_get_geocoder,
+    mock_coverage,
+    table: CommuneCoverageTable,
+    store: AntennaStore,
+):
+    # The address API gives the code of the arrondissement in Paris
+    geocoder = Mock(
+        get_xy_and_citycode_from_address=Mock(
+            return_value=(651000.0, 6863000.0, "75101")
+        )
+    )
+    mock_get_geocoder.return_value = geocoder
+    query = CoverageQuery(version="v2")
+
+    coverage = get_commune_coverage_from_address(
+        "fake address", table, store, query
+    )
+
+    assert coverage == table.coverage("75056")
+    mock_coverage.assert_not_called()
+
+    geocoder.get_xy_and_citycode_from_address.return_value = (None, None, None)
+    assert (
+        get_commune_coverage_from_address("fake address", table, store, query)
+        is None
+    )
+    mock_coverage.assert_not_called()
+
+
+@pytest.mark.parametrize("citycode", ["92012", None])
+@patch("app.communes.get_geocoder")
+def test_get_commune_coverage_from_address_not_in_table(
+    mock_get_geocoder,
+    citycode,
+    table: CommuneCoverageTable,
+    store: AntennaStore,
+):
+    # The commune is missing from the table or unknown, the coverage is the
+    # one at the address, next to the antennas, geocoded once
+    geocoder = Mock(
+        get_xy_and_citycode_from_address=Mock(
+            return_value=(648300.0, 6862200.0, citycode)
+        )
+    )
+    mock_get_geocoder.return_value = geocoder
+
+    coverage = get_commune_coverage_from_address(
+        "fake address", table, store, CoverageQuery(version="v2")
+    )
+
+    geocoder.get_xy_and_citycode_from_address.assert_called_once()
+    geocoder.get_xy_from_address.assert_not_called()
+    assert coverage == table.coverage("75056")
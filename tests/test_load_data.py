@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.constants import Columns
+from app.env import APP
+from app.load_data import (
+    DEFAULT_VERSION,
+    OPERATOR_DTYPE,
+    load_store,
+    parse_datasets,
+    read_antennas,
+)
+
+
+def test_parse_datasets():
+    assert parse_datasets("2018-01=a.csv, 2019-01 = b.csv") == {
+        "2018-01": "a.csv",
+        "2019-01": "b.csv",
+    }
+    assert parse_datasets("") == {DEFAULT_VERSION: APP.ANTENNAS_DATA_PATH}
+
+
+def test_parse_datasets_invalid():
+    with pytest.raises(ValueError, match="is not a <version>=<path> pair"):
+        parse_datasets("2018-01=a.csv,b.csv")
+
+
+def test_load_store():
+    path = "tests/resources/antennas.csv"
+    store = load_store(f"v1={path},v2={path}")
+    assert store.versions == ["v1", "v2"]
+    # The antennas of both versions are identical, so they are shared
+    assert len(store.x) == 3
+    assert (store.membership == 0b11).all()
+
+
+def test_read_antennas_rejects_invalid_rows():
+    antennas_df, report = read_antennas("tests/resources/antennas_invalid.csv")
+
+    assert antennas_df[Columns.OPERATOR].tolist() == ["Orange", "SFR"]
+    assert antennas_df["x"].tolist() == [102980, 103114]
+    assert antennas_df.dtypes.to_dict() == {
+        Columns.OPERATOR: OPERATOR_DTYPE,
+        "x": np.int32,
+        "y": np.int32,
+        "2G": np.int8,
+        "3G": np.int8,
+        "4G": np.int8,
+    }
+    assert report.rows_read == 8
+    assert report.rows_kept == 2
+    assert report.rows_rejected == 6
+    assert report.rejected == {
+        "unknown_operator": 2,
+        "out_of_bounds": 3,
+        "invalid_flags": 2,
+    }
+    assert report.unknown_operators == {"FakeOperator": 2}
+
+
+def test_read_antennas_in_chunks():
+    path = "tests/resources/antennas_invalid.csv"
+    antennas_df, report = read_antennas(path)
+    chunked_df, chunked_report = read_antennas(path, chunk_rows=3)
+
+    pd.testing.assert_frame_equal(chunked_df, antennas_df)
+    assert chunked_report.chunks == 3
+    assert chunked_report.rejected == report.rejected
+    assert chunked_report.unknown_operators == report.unknown_operators
+
+
+def test_read_antennas_missing_column(tmp_path):
+    path = tmp_path / "antennas.csv"
+    path.write_text("Operateur,x,y,2G,3G\nOrange,650000,6860000,1,1\n")
+
+    with pytest.raises(ValueError):
+        read_antennas(str(path))
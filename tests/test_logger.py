@@ -0,0 +1,133 @@
+import json
+import logging
+import queue
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import logger as app_logger
+from app.logger import (
+    JSONFormatter,
+    RequestContextFilter,
+    log_details,
+    request_context,
+    stage,
+)
+from app.main import REQUEST_ID_HEADER, app
+
+
+def _record(**extra) -> logging.LogRecord:
+    record = logging.makeLogRecord(
+        {"name": "app.test", "levelname": "INFO", "msg": "%s found"}
+    )
+    record.args = ("address",)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    record = _record(status=200, stages_ms={"coverage": 1.5}, empty=None)
+    RequestContextFilter().filter(record)
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["message"] == "address found"
+    assert entry["logger"] == "app.test"
+    assert entry["level"] == "INFO"
+    assert entry["status"] == 200
+    assert entry["stages_ms"] == {"coverage": 1.5}
+    assert entry["request_id"] == "-"
+    assert "empty" not in entry
+
+
+def test_request_context_id_and_stages():
+    with request_context("abc") as context:
+        record = _record()
+        RequestContextFilter().filter(record)
+        with stage("geocoding"):
+            pass
+        with stage("geocoding"):
+            pass
+        app_logger.add_stage_time("address_api_queue", 0.25)
+
+    assert record.request_id == "abc"
+    assert set(context.stages) == {"geocoding", "address_api_queue"}
+    assert context.stages["address_api_queue"] == 0.25
+    # Outside of a request, stages are ignored
+    with stage("geocoding"):
+        app_logger.add_stage_time("address_api_queue", 1)
+
+
+@pytest.mark.parametrize(("rate", "sampled"), [(0.0, False), (1.0, True)])
+def test_detail_lines_are_sampled_per_request(rate, sampled):
+    with patch.object(app_logger.APP, "LOG_DETAIL_SAMPLE_RATE", rate):
+        with request_context() as context:
+            assert context.sampled is sampled
+            assert all(log_details() is sampled for _ in range(10))
+        assert log_details() is sampled
+
+
+def test_request_summary_line(caplog):
+    client = TestClient(app)
+    with caplog.at_level(logging.INFO, logger="app.main"):
+        response = client.post(
+            "/coverage?version=unknown",
+            json={"address": "fake address"},
+            headers={REQUEST_ID_HEADER: "abc"},
+        )
+
+    assert response.headers[REQUEST_ID_HEADER] == "abc"
+    (summary,) = [r for r in caplog.records if r.name == "app.main"]
+    assert summary.status == 422
+    assert summary.path == "/coverage"
+    assert summary.stages_ms == {}
+    assert summary.duration_ms > 0
+
+
+def test_request_id_is_generated():
+    response = TestClient(app).post(
+        "/coverage?version=unknown", json={"address": "fake address"}
+    )
+    assert len(response.headers[REQUEST_ID_HEADER]) == 32
+
+
+def _queued_exception_record() -> logging.LogRecord:
+    handler = app_logger.ExceptionQueueHandler(queue.SimpleQueue())
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.addFilter(RequestContextFilter())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.makeLogRecord(
+            {
+                "name": "app.test",
+                "levelname": "ERROR",
+                "msg": "%s failed",
+                "args": ("address",),
+                "exc_info": sys.exc_info(),
+            }
+        )
+    handler.handle(record)
+    return handler.queue.get_nowait()
+
+
+def test_json_formatter_queued_exception():
+    record = _queued_exception_record()
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert record.exc_info is None
+    assert entry["message"] == "address failed"
+    assert entry["exception"].startswith("Traceback")
+    assert entry["exception"].endswith("ValueError: boom")
+
+
+def test_text_formatter_queued_exception():
+    record = _queued_exception_record()
+
+    text = app_logger.TextFormatter(app_logger.LOGGER_FORMAT).format(record)
+
+    assert "address failed\nTraceback" in text
+    assert text.endswith("ValueError: boom")
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.constants import Generation
+from app.radius import (
+    DEFAULT_MODEL,
+    RadiusModel,
+    Region,
+    get_radius_models,
+    load_radius_models,
+    parse_radii,
+)
+
+DEFAULTS = {"2G": 30.0, "3G": 5.0, "4G": 10.0}
+
+
+def test_parse_radii():
+    assert parse_radii("2G=30, 3G=5,4G=10") == DEFAULTS
+    with pytest.raises(ValueError, match="is not a <generation>=<km> pair"):
+        parse_radii("2G=30,3G")
+
+
+def test_radius_model_invalid():
+    with pytest.raises(ValueError, match="Generation 5G not supported"):
+        RadiusModel("fake", {**DEFAULTS, "5G": 1.0})
+    with pytest.raises(ValueError, match="has no radius for 4G"):
+        RadiusModel("fake", {"2G": 30.0, "3G": 5.0})
+    with pytest.raises(ValueError, match="Radius of 2G must be between"):
+        RadiusModel("fake", {**DEFAULTS, "2G": 100.0})
+
+
+def test_radius_model_radii():
+    model = RadiusModel(
+        "urban",
+        DEFAULTS,
+        regions=(
+            Region("paris", (0, 0, 10, 10), {"4G": 3.0}),
+            Region("ile-de-france", (0, 0, 100, 100), {"4G": 5.0}),
+        ),
+    )
+    x = np.array([5, 50, 500])
+    y = np.array([5, 50, 500])
+
+    # No region for the generation: the radius is shared by all the antennas
+    assert model.radii(Generation.TWO_G, x, y) == 30_000
+    # The first region containing the antenna wins
+    assert model.radii(Generation.FOUR_G, x, y).tolist() == [
+        3_000,
+        5_000,
+        10_000,
+    ]
+    assert model.max_radius(Generation.FOUR_G) == 10_000
+
+
+def test_load_radius_models(tmp_path):
+    models_path = tmp_path / "models.json"
+    models_path.write_text(
+        json.dumps(
+            {
+                "urban": {
+                    "km_coverage": {"2G": 10},
+                    "regions": [
+                        {
+                            "name": "paris",
+                            "bbox": [0, 0, 10, 10],
+                            "km_coverage": {"4G": 3},
+                        }
+                    ],
+                }
+            }
+        )
+    )
+    models = load_radius_models("2G=30,3G=5,4G=10", str(models_path))
+
+    assert list(models) == [DEFAULT_MODEL, "urban"]
+    assert models[DEFAULT_MODEL].km_coverage == DEFAULTS
+    assert models["urban"].km_coverage == {**DEFAULTS, "2G": 10}
+    assert models["urban"].regions[0].bbox == (0, 0, 10, 10)
+
+
+def test_get_radius_models():
+    assert get_radius_models([DEFAULT_MODEL])[0].name == DEFAULT_MODEL
+    with pytest.raises(ValueError, match="Radius model fake not found"):
+        get_radius_models(["fake"])
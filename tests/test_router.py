@@ -1,4 +1,4 @@
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pytest
 from fastapi.testclient import TestClient
@@ -66,3 +66,155 @@ class TestRouter:
             )
             assert response.status_code == 200
             assert response.json() == {"address1": None, "address2": result}
+
+    @patch("app.router.get_coverage_from_address")
+    def test_get_coverage_version(
+        self, mock_get_coverage_from_address, client, result
+    ):
+        mock_get_coverage_from_address.return_value = result
+
+        with client as c:
+            response = c.post(
+                "/coverage?version=default",
+                json={"address": "fake address"},
+            )
+            assert response.status_code == 200
+            assert (
+                mock_get_coverage_from_address.call_args.kwargs[
+                    "query"
+                ].version
+                == "default"
+            )
+
+    def test_get_coverage_unknown_version(self, client):
+        with client as c:
+            response = c.post(
+                "/coverage?version=fake",
+                json={"address": "fake address"},
+            )
+            assert response.status_code == 422
+            assert "Version fake not found" in response.json()["detail"]
+
+    @patch("app.router.get_coverage_diff_from_address")
+    def test_get_coverage_diff(
+        self, mock_get_coverage_diff_from_address, client
+    ):
+        diff = {"Orange": {"4G": {"base": False, "target": True}}}
+        mock_get_coverage_diff_from_address.side_effect = [diff, None]
+
+        with client as c:
+            response = c.post(
+                "/coverage/diff?base=default&target=default",
+                json={
+                    "address1": "fake address 1",
+                    "address2": "fake address 2",
+                },
+            )
+            assert response.status_code == 200
+            assert response.json() == {"address1": diff, "address2": None}
+
+    @patch("app.router.get_coverage_what_if_from_address")
+    def test_get_coverage_what_if(
+        self, mock_get_coverage_what_if_from_address, client, result
+    ):
+        mock_get_coverage_what_if_from_address.return_value = {
+            "default": result
+        }
+
+        with client as c:
+            response = c.post(
+                "/coverage/what-if?models=default",
+                json={"address": "fake address"},
+            )
+            assert response.status_code == 200
+            assert response.json() == {"address": {"default": result}}
+
+    def test_get_coverage_unknown_model(self, client):
+        with client as c:
+            response = c.post(
+                "/coverage?model=fake",
+                json={"address": "fake address"},
+            )
+            assert response.status_code == 422
+            assert response.json()["detail"] == "Radius model fake not found"
+
+    @patch("app.router.get_commune_coverage_from_address")
+    @patch("app.router.get_commune_table")
+    def test_get_coverage_commune(
+        self,
+        mock_get_commune_table,
+        mock_get_commune_coverage_from_address,
+        client,
+        result,
+    ):
+        mock_get_commune_table.return_value = Mock(
+            version="default", model="default", generation=0
+        )
+        mock_get_commune_coverage_from_address.side_effect = [result, None]
+
+        with client as c:
+            response = c.post(
+                "/coverage?granularity=commune",
+                json={
+                    "address1": "fake address 1",
+                    "address2": "fake address 2",
+                },
+            )
+            assert response.status_code == 200
+            assert response.json() == {"address1": result, "address2": None}
+        call = mock_get_commune_coverage_from_address.call_args_list[0]
+        assert call.kwargs["address"] == "fake address 1"
+        assert call.kwargs["query"].version is None
+        assert call.kwargs["query"].radius_model.name == "default"
+
+    @patch("app.router.get_commune_table")
+    def test_get_coverage_commune_no_table(
+        self, mock_get_commune_table, client
+    ):
+        mock_get_commune_table.return_value = None
+
+        with client as c:
+            response = c.post(
+                "/coverage?granularity=commune",
+                json={"address": "fake address"},
+            )
+            assert response.status_code == 503
+            assert response.json()["detail"] == (
+                "No commune coverage table available"
+            )
+
+    @patch("app.router.get_commune_table")
+    def test_get_coverage_commune_other_model(
+        self, mock_get_commune_table, client
+    ):
+        mock_get_commune_table.return_value = Mock(
+            version="default", model="urban"
+        )
+
+        with client as c:
+            response = c.post(
+                "/coverage?granularity=commune",
+                json={"address": "fake address"},
+            )
+            assert response.status_code == 422
+            assert "model urban" in response.json()["detail"]
+
+    @patch("app.router.antennas_store")
+    @patch("app.router.get_commune_table")
+    def test_get_coverage_commune_out_of_date(
+        self, mock_get_commune_table, mock_antennas_store, client
+    ):
+        mock_antennas_store.snapshot.return_value = Mock(
+            default_version="default", generation=2
+        )
+        mock_get_commune_table.return_value = Mock(
+            version="default", model="default", generation=1
+        )
+
+        with client as c:
+            response = c.post(
+                "/coverage?granularity=commune",
+                json={"address": "fake address"},
+            )
+            assert response.status_code == 422
+            assert "out of date" in response.json()["detail"]
@@ -1,12 +1,15 @@
 from unittest.mock import patch
 
 import geopandas as gpd
+import numpy as np
 import pytest
 from shapely.geometry import Point
 
 from app import services
 from app.constants import PROJECTED_COORDINATE_SYSTEM as CRS
 from app.constants import Generation, Operator
+from app.radius import RadiusModel, Region
+from app.store import AntennaStore
 
 
 @pytest.fixture
@@ -27,7 +30,14 @@ def geo_df() -> gpd.GeoDataFrame:
     )
 
 
-def test_coverage_of_one_generation(geo_df: gpd.GeoDataFrame):
+@pytest.fixture
+def store(geo_df: gpd.GeoDataFrame) -> AntennaStore:
+    return AntennaStore.from_geo_dfs({"default": geo_df})
+
+
+def test_coverage_of_one_generation(
+    geo_df: gpd.GeoDataFrame, store: AntennaStore
+):
     operators = [
         Operator.ORANGE,
         Operator.SFR,
@@ -38,49 +48,49 @@ def test_coverage_of_one_generation(geo_df: gpd.GeoDataFrame):
     coverage = services._coverage_of_one_generation(
         x=geo_df.geometry.x[0],
         y=geo_df.geometry.y[0],
-        antennas_geo_df=geo_df,
+        antennas_store=store,
         generation=Generation.TWO_G,
-        operators=operators,
+        query=services.CoverageQuery(operators=operators),
     )
-    assert coverage.to_dict(orient="index") == {
-        "Orange": {Generation.TWO_G.value: True},
-        "SFR": {Generation.TWO_G.value: False},
-        "Bouygues": {Generation.TWO_G.value: True},
-        "Free": {Generation.TWO_G.value: False},
+    assert coverage == {
+        "Orange": True,
+        "SFR": False,
+        "Bouygues": True,
+        "Free": False,
     }
 
     # Test the coverage of the antennas for the 3G generation
     coverage = services._coverage_of_one_generation(
         x=geo_df.geometry.x[0],
         y=geo_df.geometry.y[0],
-        antennas_geo_df=geo_df,
+        antennas_store=store,
         generation=Generation.THREE_G,
-        operators=operators,
+        query=services.CoverageQuery(operators=operators),
     )
-    assert coverage.to_dict(orient="index") == {
-        "Orange": {Generation.THREE_G.value: True},
-        "SFR": {Generation.THREE_G.value: True},
-        "Bouygues": {Generation.THREE_G.value: False},
-        "Free": {Generation.THREE_G.value: False},
+    assert coverage == {
+        "Orange": True,
+        "SFR": True,
+        "Bouygues": False,
+        "Free": False,
     }
 
     # Test the coverage of the antennas for the 4G generation
     coverage = services._coverage_of_one_generation(
         x=geo_df.geometry.x[0],
         y=geo_df.geometry.y[0],
-        antennas_geo_df=geo_df,
+        antennas_store=store,
         generation=Generation.FOUR_G,
-        operators=operators,
+        query=services.CoverageQuery(operators=operators),
     )
-    assert coverage.to_dict(orient="index") == {
-        "Orange": {Generation.FOUR_G.value: True},
-        "SFR": {Generation.FOUR_G.value: True},
-        "Bouygues": {Generation.FOUR_G.value: True},
-        "Free": {Generation.FOUR_G.value: True},
+    assert coverage == {
+        "Orange": True,
+        "SFR": True,
+        "Bouygues": True,
+        "Free": True,
     }
 
 
-def test_coverage(geo_df: gpd.GeoDataFrame):
+def test_coverage(geo_df: gpd.GeoDataFrame, store: AntennaStore):
     operators = [
         Operator.ORANGE,
         Operator.SFR,
@@ -93,9 +103,10 @@ def test_coverage(geo_df: gpd.GeoDataFrame):
     coverage = services.coverage(
         x=geo_df.geometry.x[0],
         y=geo_df.geometry.y[0],
-        antennas_geo_df=geo_df,
-        generations=generations,
-        operators=operators,
+        antennas_store=store,
+        query=services.CoverageQuery(
+            generations=generations, operators=operators
+        ),
     )
     assert coverage == {
         "Orange": {
@@ -121,7 +132,9 @@ def test_coverage(geo_df: gpd.GeoDataFrame):
     }
 
 
-def test_coverage_antenna_too_far(geo_df: gpd.GeoDataFrame):
+def test_coverage_antenna_too_far(
+    geo_df: gpd.GeoDataFrame, store: AntennaStore
+):
     operators = [
         Operator.ORANGE,
         Operator.SFR,
@@ -135,9 +148,10 @@ def test_coverage_antenna_too_far(geo_df: gpd.GeoDataFrame):
     coverage = services.coverage(
         x=654412.35,  # x coordinate of papernest office in Paris
         y=6866689.51,  # y coordinate of papernest office in Paris
-        antennas_geo_df=geo_df,
-        generations=generations,
-        operators=operators,
+        antennas_store=store,
+        query=services.CoverageQuery(
+            generations=generations, operators=operators
+        ),
     )
     assert coverage == {
         "Orange": {
@@ -168,9 +182,10 @@ def test_coverage_antenna_too_far(geo_df: gpd.GeoDataFrame):
     coverage = services.coverage(
         x=664395.97,  # x coordinate of CDG airport
         y=6877653.18,  # y coordinate of CDG airport
-        antennas_geo_df=geo_df,
-        generations=generations,
-        operators=operators,
+        antennas_store=store,
+        query=services.CoverageQuery(
+            generations=generations, operators=operators
+        ),
     )
     assert coverage == {
         "Orange": {
@@ -202,9 +217,10 @@ def test_coverage_antenna_too_far(geo_df: gpd.GeoDataFrame):
     coverage = services.coverage(
         x=669173.95,  # x coordinate of Savigny-Le-Temple train station
         y=6832848.49,  # y coordinate of Savigny-Le-Temple train station
-        antennas_geo_df=geo_df,
-        generations=generations,
-        operators=operators,
+        antennas_store=store,
+        query=services.CoverageQuery(
+            generations=generations, operators=operators
+        ),
     )
     assert coverage == {
         "Orange": {
@@ -231,7 +247,7 @@ def test_coverage_antenna_too_far(geo_df: gpd.GeoDataFrame):
 
 
 def test_coverage_unsupported_generation(
-    geo_df: gpd.GeoDataFrame,
+    geo_df: gpd.GeoDataFrame, store: AntennaStore
 ):
     generation = "5G"
 
@@ -240,14 +256,15 @@ def test_coverage_unsupported_generation(
         services.coverage(
             x=geo_df.geometry.x[0],
             y=geo_df.geometry.y[0],
-            antennas_geo_df=geo_df,
-            generations=[generation],
-            operators=[Operator.ORANGE],
+            antennas_store=store,
+            query=services.CoverageQuery(
+                generations=[generation], operators=[Operator.ORANGE]
+            ),
         )
 
 
 def test_coverage_unsupported_operator(
-    geo_df: gpd.GeoDataFrame,
+    geo_df: gpd.GeoDataFrame, store: AntennaStore
 ):
     operator = "RED"
 
@@ -256,14 +273,17 @@ def test_coverage_unsupported_operator(
         services.coverage(
             x=geo_df.geometry.x[0],
             y=geo_df.geometry.y[0],
-            antennas_geo_df=geo_df,
-            generations=[Generation.TWO_G],
-            operators=[operator],
+            antennas_store=store,
+            query=services.CoverageQuery(
+                generations=[Generation.TWO_G], operators=[operator]
+            ),
         )
 
 
 @patch("app.api_address.client.APIAddressClient.get_xy_from_address")
-def test_get_coverage_from_address(mock_get_xy, geo_df: gpd.GeoDataFrame):
+def test_get_coverage_from_address(
+    mock_get_xy, geo_df: gpd.GeoDataFrame, store: AntennaStore
+):
     mock_get_xy.return_value = (geo_df.geometry.x[0], geo_df.geometry.y[0])
     operators = [
         Operator.ORANGE,
@@ -274,9 +294,10 @@ def test_get_coverage_from_address(mock_get_xy, geo_df: gpd.GeoDataFrame):
     generations = [Generation.TWO_G, Generation.THREE_G, Generation.FOUR_G]
     coverage = services.get_coverage_from_address(
         address="fake address",
-        antennas_geo_df=geo_df,
-        generations=generations,
-        operators=operators,
+        antennas_store=store,
+        query=services.CoverageQuery(
+            generations=generations, operators=operators
+        ),
     )
     assert coverage == {
         "Orange": {
@@ -304,13 +325,225 @@ def test_get_coverage_from_address(mock_get_xy, geo_df: gpd.GeoDataFrame):
 
 @patch("app.api_address.client.APIAddressClient.get_xy_from_address")
 def test_get_coverage_from_address_no_address_found(
-    mock_get_xy, geo_df: gpd.GeoDataFrame
+    mock_get_xy, geo_df: gpd.GeoDataFrame, store: AntennaStore
 ):
     mock_get_xy.return_value = (None, None)
     coverage = services.get_coverage_from_address(
         address="fake address",
-        antennas_geo_df=geo_df,
-        generations=[Generation.TWO_G],
-        operators=[Operator.ORANGE],
+        antennas_store=store,
+        query=services.CoverageQuery(
+            generations=[Generation.TWO_G], operators=[Operator.ORANGE]
+        ),
     )
     assert coverage is None
+
+
+@pytest.fixture
+def versioned_store(geo_df: gpd.GeoDataFrame) -> AntennaStore:
+    # In the new version, the Free antenna supports the 3G generation and the
+    # Orange antenna is decommissioned
+    new_geo_df = geo_df.copy()
+    new_geo_df.loc[3, "3G"] = 1
+    new_geo_df = new_geo_df.drop(index=0)
+    return AntennaStore.from_geo_dfs({"old": geo_df, "new": new_geo_df})
+
+
+def test_coverage_version(geo_df: gpd.GeoDataFrame, versioned_store):
+    coverage = services.coverage(
+        x=geo_df.geometry.x[0],
+        y=geo_df.geometry.y[0],
+        antennas_store=versioned_store,
+        query=services.CoverageQuery(
+            generations=[Generation.THREE_G],
+            operators=[Operator.ORANGE, Operator.FREE],
+            version="old",
+        ),
+    )
+    assert coverage == {
+        "Orange": {Generation.THREE_G.value: True},
+        "Free": {Generation.THREE_G.value: False},
+    }
+
+    # The default version is the last one
+    coverage = services.coverage(
+        x=geo_df.geometry.x[0],
+        y=geo_df.geometry.y[0],
+        antennas_store=versioned_store,
+        query=services.CoverageQuery(
+            generations=[Generation.THREE_G],
+            operators=[Operator.ORANGE, Operator.FREE],
+        ),
+    )
+    assert coverage == {
+        "Orange": {Generation.THREE_G.value: False},
+        "Free": {Generation.THREE_G.value: True},
+    }
+
+
+def test_coverage_unknown_version(geo_df: gpd.GeoDataFrame, versioned_store):
+    with pytest.raises(ValueError, match="Version fake not found"):
+        services.coverage(
+            x=geo_df.geometry.x[0],
+            y=geo_df.geometry.y[0],
+            antennas_store=versioned_store,
+            query=services.CoverageQuery(
+                generations=[Generation.TWO_G],
+                operators=[Operator.ORANGE],
+                version="fake",
+            ),
+        )
+
+
+@patch("app.api_address.client.APIAddressClient.get_xy_from_address")
+def test_get_coverage_diff_from_address(
+    mock_get_xy, geo_df: gpd.GeoDataFrame, versioned_store
+):
+    mock_get_xy.return_value = (geo_df.geometry.x[0], geo_df.geometry.y[0])
+    diff = services.get_coverage_diff_from_address(
+        address="fake address",
+        antennas_store=versioned_store,
+        base=services.CoverageQuery(version="old"),
+        target=services.CoverageQuery(version="new"),
+    )
+    assert diff == {
+        "Orange": {
+            Generation.TWO_G.value: {"base": True, "target": False},
+            Generation.THREE_G.value: {"base": True, "target": False},
+            Generation.FOUR_G.value: {"base": True, "target": False},
+        },
+        "Free": {Generation.THREE_G.value: {"base": False, "target": True}},
+    }
+
+    mock_get_xy.return_value = (None, None)
+    diff = services.get_coverage_diff_from_address(
+        address="fake address",
+        antennas_store=versioned_store,
+        base=services.CoverageQuery(version="old"),
+        target=services.CoverageQuery(version="new"),
+    )
+    assert diff is None
+
+
+def test_coverage_what_if(store: AntennaStore):
+    # Papernest office in Paris is approx 7.5 km away from the Eiffel Tower
+    x, y = 654412.35, 6866689.51
+    default = RadiusModel("default", {"2G": 30, "3G": 5, "4G": 10})
+    wider_3g = RadiusModel("wider_3g", {"2G": 30, "3G": 8, "4G": 10})
+    # The antennas around the Eiffel Tower only reach 2 km in 4G
+    urban = RadiusModel(
+        "urban",
+        {"2G": 30, "3G": 5, "4G": 10},
+        regions=(
+            Region("paris", (640000, 6850000, 660000, 6870000), {"4G": 2}),
+        ),
+    )
+    coverage = services.coverage_what_if(
+        x=x,
+        y=y,
+        antennas_store=store,
+        query=services.CoverageQuery(
+            generations=[Generation.THREE_G, Generation.FOUR_G],
+            operators=[Operator.ORANGE, Operator.BOUYGUES],
+        ),
+        radius_models=[default, wider_3g, urban],
+    )
+    assert coverage == {
+        "default": {
+            "Orange": {"3G": False, "4G": True},
+            "Bouygues": {"3G": False, "4G": True},
+        },
+        "wider_3g": {
+            "Orange": {"3G": True, "4G": True},
+            "Bouygues": {"3G": False, "4G": True},
+        },
+        "urban": {
+            "Orange": {"3G": False, "4G": False},
+            "Bouygues": {"3G": False, "4G": False},
+        },
+    }
+
+    # The coverage under a single model is the same
+    assert (
+        services.coverage(
+            x=x,
+            y=y,
+            antennas_store=store,
+            query=services.CoverageQuery(
+                generations=[Generation.THREE_G, Generation.FOUR_G],
+                operators=[Operator.ORANGE, Operator.BOUYGUES],
+                radius_model=wider_3g,
+            ),
+        )
+        == coverage["wider_3g"]
+    )
+
+
+@pytest.fixture
+def random_store() -> AntennaStore:
+    rng = np.random.default_rng(0)
+    count = 2_000
+    return AntennaStore.from_geo_dfs(
+        {
+            "default": gpd.GeoDataFrame(
+                {
+                    "Operateur": rng.choice(list(Operator), count),
+                    "2G": rng.integers(0, 2, count),
+                    "3G": rng.integers(0, 2, count),
+                    "4G": rng.integers(0, 2, count),
+                    "geometry": gpd.points_from_xy(
+                        rng.uniform(600_000, 700_000, count),
+                        rng.uniform(6_800_000, 6_900_000, count),
+                    ),
+                },
+                crs=CRS,
+            )
+        }
+    )
+
+
+def test_coverage_batch(random_store: AntennaStore):
+    rng = np.random.default_rng(1)
+    x = rng.uniform(550_000, 750_000, 500)
+    y = rng.uniform(6_750_000, 6_950_000, 500)
+    urban = RadiusModel(
+        "urban",
+        {"2G": 10, "3G": 2, "4G": 3},
+        regions=(
+            Region("center", (630000, 6830000, 670000, 6870000), {"4G": 1}),
+        ),
+    )
+    generations = [Generation.FOUR_G, Generation.TWO_G]
+    operators = [Operator.FREE, Operator.ORANGE, Operator.SFR]
+
+    query = services.CoverageQuery(generations, operators, radius_model=urban)
+    coverages = services.coverage_batch(x, y, random_store, query)
+
+    assert coverages.shape == (500, 3, 2)
+    # Both covered and uncovered locations are checked
+    assert 0 < coverages.mean() < 1
+    for i in range(len(x)):
+        coverage = services.coverage(x[i], y[i], random_store, query)
+        assert coverages[i].tolist() == [
+            [coverage[operator][generation] for generation in generations]
+            for operator in operators
+        ]
+    # The sort of the locations only changes the speed
+    unsorted = services._coverage_batch(x, y, random_store, query, sort=False)
+    assert np.array_equal(unsorted, coverages)
+
+
+def test_coverage_batch_empty(store: AntennaStore):
+    coverages = services.coverage_batch(
+        np.array([]), np.array([]), store, services.CoverageQuery()
+    )
+    assert coverages.shape == (0, 4, 3)
+
+
+def test_coverage_batch_unsupported_generation(store: AntennaStore):
+    with pytest.raises(ValueError, match="Generation 5G not supported"):
+        services.coverage_batch(
+            np.array([0.0]),
+            np.array([0.0]),
+            store,
+            services.CoverageQuery(generations=["5G"]),
+        )
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.spatial import GridIndex, hilbert_keys
+
+
+@pytest.mark.parametrize("cell_size", [1_000, 10_000, 50_000])
+@pytest.mark.parametrize("radius", [500, 5_000, 30_000])
+def test_grid_index_query_finds_every_point_in_radius(cell_size, radius):
+    rng = np.random.default_rng(0)
+    x = rng.uniform(600_000, 700_000, 5_000)
+    y = rng.uniform(6_800_000, 6_900_000, 5_000)
+    index = GridIndex(x, y, cell_size=cell_size)
+
+    for qx, qy in zip(x[:20], y[:20], strict=True):
+        candidates = index.query(qx, qy, radius)
+        # Candidates are unique
+        assert len(candidates) == len(set(candidates.tolist()))
+        expected = np.flatnonzero((x - qx) ** 2 + (y - qy) ** 2 <= radius**2)
+        assert set(expected.tolist()) <= set(candidates.tolist())
+
+
+def test_grid_index_query_empty():
+    index = GridIndex(np.array([0.0]), np.array([0.0]), cell_size=1_000)
+    assert len(index.query(100_000, 100_000, 1_000)) == 0
+
+    index = GridIndex(np.array([]), np.array([]), cell_size=1_000)
+    assert len(index.query(0, 0, 1_000)) == 0
+
+
+def test_grid_index_invalid_cell_size():
+    with pytest.raises(ValueError, match="Cell size must be positive"):
+        GridIndex(np.array([0.0]), np.array([0.0]), cell_size=0)
+
+
+def test_hilbert_keys_visit_every_cell_once_by_neighbour_steps():
+    side = 16
+    ix, iy = np.meshgrid(np.arange(side), np.arange(side), indexing="ij")
+    ix, iy = ix.ravel(), iy.ravel()
+
+    keys = hilbert_keys(ix + 0.5, iy + 0.5, (0, 0, side, side), order=4)
+
+    assert sorted(keys.tolist()) == list(range(side * side))
+    order = np.argsort(keys)
+    steps = np.abs(np.diff(ix[order])) + np.abs(np.diff(iy[order]))
+    assert (steps == 1).all()
+
+
+def test_hilbert_keys_clip_points_outside_bounds():
+    keys = hilbert_keys(
+        np.array([-10.0, 0.0, 20.0, 16.0]),
+        np.array([-10.0, 0.0, 20.0, 15.9]),
+        (0, 0, 16, 16),
+        order=4,
+    )
+    assert keys[0] == keys[1]
+    assert keys[2] == keys[3]
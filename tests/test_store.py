@@ -0,0 +1,238 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import Point
+
+from app.constants import METROPOLITAN_BOUNDS
+from app.constants import PROJECTED_COORDINATE_SYSTEM as CRS
+from app.spatial import hilbert_keys
+from app.store import (
+    UNKNOWN_OPERATOR,
+    AntennaNotFoundError,
+    AntennaStore,
+    LiveAntennaStore,
+)
+
+
+def _geo_df(rows) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(
+        {
+            "Operateur": [row[0] for row in rows],
+            "2G": [row[1] for row in rows],
+            "3G": [row[2] for row in rows],
+            "4G": [row[3] for row in rows],
+            "geometry": [Point(row[4], row[5]) for row in rows],
+        },
+        crs=CRS,
+    )
+
+
+def test_store_shares_unchanged_antennas_between_versions():
+    old = _geo_df(
+        [
+            ("Orange", 1, 1, 0, 100, 200),
+            ("SFR", 1, 0, 0, 300, 400),
+        ]
+    )
+    new = _geo_df(
+        [
+            ("Orange", 1, 1, 0, 100, 200),  # unchanged
+            ("SFR", 1, 0, 1, 300, 400),  # upgraded to 4G
+            ("Free", 0, 0, 1, 500, 600),  # new antenna
+        ]
+    )
+    store = AntennaStore.from_geo_dfs({"2018": old, "2019": new})
+
+    assert store.versions == ["2018", "2019"]
+    assert store.default_version == "2019"
+    assert len(store.x) == 4
+    memberships = {
+        (int(x), int(gens)): int(membership)
+        for x, gens, membership in zip(
+            store.x, store.generations, store.membership, strict=True
+        )
+    }
+    assert memberships == {
+        (100, 0b011): 0b11,
+        (300, 0b001): 0b01,
+        (300, 0b101): 0b10,
+        (500, 0b100): 0b10,
+    }
+
+
+def test_store_unknown_operator():
+    store = AntennaStore.from_geo_dfs(
+        {"default": _geo_df([("FakeOperator", 1, 1, 1, 0, 0)])}
+    )
+    assert store.operator.tolist() == [UNKNOWN_OPERATOR]
+
+
+def test_store_version_bit():
+    geo_df = _geo_df([("Orange", 1, 1, 1, 0, 0)])
+    store = AntennaStore.from_geo_dfs({"a": geo_df, "b": geo_df})
+
+    assert store.version_bit("a") == 0b01
+    assert store.version_bit("b") == 0b10
+    assert store.version_bit() == 0b10
+    with pytest.raises(ValueError, match="Version c not found"):
+        store.version_bit("c")
+
+
+def test_store_invalid_number_of_datasets():
+    with pytest.raises(ValueError, match="Between 1 and 32 datasets"):
+        AntennaStore.from_geo_dfs({})
+
+
+@pytest.fixture
+def live_store() -> LiveAntennaStore:
+    geo_df = _geo_df(
+        [
+            ("Orange", 1, 1, 0, 100, 200),
+            ("SFR", 1, 0, 0, 50_000, 400),
+        ]
+    )
+    return LiveAntennaStore(
+        AntennaStore.from_geo_dfs({"old": geo_df, "new": geo_df})
+    )
+
+
+def test_live_store_insert(live_store: LiveAntennaStore):
+    before = live_store.snapshot()
+    antenna_id = live_store.insert(
+        {"operator": "Free", "x": 300, "y": 400, "2G": 0, "3G": 0, "4G": 1}
+    )
+    after = live_store.snapshot()
+
+    assert live_store.get(antenna_id) == {
+        "id": antenna_id,
+        "operator": "Free",
+        "x": 300,
+        "y": 400,
+        "2G": False,
+        "3G": False,
+        "4G": True,
+        "versions": ["new"],
+    }
+    # The snapshots taken before the update are unchanged
+    with pytest.raises(AntennaNotFoundError):
+        before.antenna(antenna_id)
+    assert len(before.x) == 2
+    assert antenna_id in after.index.query(0, 0, 1_000)
+    # Only the cell of the new antenna is rebuilt
+    far_cell = next(cell for cell in before.index.cells if cell != (0, 0))
+    assert after.index.cells[far_cell] is before.index.cells[far_cell]
+
+
+def test_live_store_update_keeps_other_versions(live_store: LiveAntennaStore):
+    assert live_store.update(0, {"4G": True}, version="new") == 0
+
+    assert live_store.get(0)["4G"] is True
+    assert live_store.get(0)["versions"] == ["new"]
+    # The antenna is unchanged in the old version, under the same id
+    assert live_store.get(0, version="old")["4G"] is False
+    assert live_store.get(0, version="old")["versions"] == ["old"]
+    snapshot = live_store.snapshot()
+    rows = snapshot.index.query(100, 200, 1_000)
+    assert sorted(
+        snapshot.antenna(int(row))["versions"][0] for row in rows
+    ) == [
+        "new",
+        "old",
+    ]
+    assert snapshot.ids[rows].tolist() == [0, 0]
+
+
+def test_live_store_move_antenna(live_store: LiveAntennaStore):
+    assert live_store.update(1, {"x": 100, "y": 200}) == 1
+    snapshot = live_store.snapshot()
+
+    assert 1 in snapshot.ids[snapshot.index.query(100, 200, 10)]
+    assert live_store.get(1)["x"] == 100
+    # The antenna stays in place in the old version
+    assert 1 not in snapshot.index.query(50_000, 400, 10)
+    assert live_store.get(1, version="old")["x"] == 50_000
+
+
+def test_live_store_remove(live_store: LiveAntennaStore):
+    # The antenna is kept in the new version only
+    live_store.remove(0, version="old")
+    assert live_store.get(0)["versions"] == ["new"]
+
+    live_store.remove(0, version="new")
+    assert len(live_store.snapshot().index.query(100, 200, 1_000)) == 0
+
+    with pytest.raises(AntennaNotFoundError, match="Antenna 0 not found"):
+        live_store.remove(0)
+    live_store.remove(1, version="new")
+    # An antenna missing from the default version is returned as it is in
+    # the other versions
+    assert live_store.get(1)["versions"] == ["old"]
+    with pytest.raises(
+        AntennaNotFoundError, match="Antenna 1 not found in version new"
+    ):
+        live_store.get(1, version="new")
+    with pytest.raises(
+        AntennaNotFoundError, match="Antenna 1 not found in version new"
+    ):
+        live_store.remove(1, version="new")
+
+
+def test_live_store_grows(live_store: LiveAntennaStore):
+    for i in range(2_000):
+        live_store.insert(
+            {"operator": "Orange", "x": i, "y": 0, "2G": 1, "3G": 0, "4G": 0}
+        )
+    snapshot = live_store.snapshot()
+    assert len(snapshot.x) == 2_002
+    assert snapshot.antenna(2_001)["x"] == 1_999
+
+
+def test_live_store_subscribe(live_store: LiveAntennaStore):
+    calls = []
+    live_store.subscribe(
+        lambda snapshot, rows: calls.append((snapshot, rows.tolist()))
+    )
+
+    live_store.update(0, {"4G": True}, version="new")
+
+    ((snapshot, rows),) = calls
+    # The listener is called with the snapshot before it is published
+    assert snapshot is live_store.snapshot()
+    assert snapshot.generation == 1
+    # The antenna kept in the old version, the updated one, and the removed
+    # one
+    assert rows == [2, 3, 0]
+
+
+def test_live_store_subscribe_after_updates(live_store: LiveAntennaStore):
+    live_store.remove(1)
+    calls = []
+
+    live_store.subscribe(lambda snapshot, rows: calls.append(rows))
+
+    # The rows changed before the listener was added are unknown
+    assert calls == [None]
+
+
+def test_live_store_failing_listener(live_store: LiveAntennaStore):
+    def listener(snapshot, rows):
+        raise ValueError("boom")
+
+    live_store.subscribe(listener)
+    live_store.remove(1)
+
+    assert live_store.snapshot().generation == 1
+    assert live_store.get(1)["versions"] == ["old"]
+
+
+def test_store_orders_antennas_along_hilbert_curve():
+    rows = [
+        ("Orange", 1, 0, 0, x, y)
+        for x, y in [(900_000, 6_100_000), (200_000, 7_000_000)] * 3
+    ]
+    rows += [("SFR", 1, 0, 0, 650_000, 6_860_000)]
+    store = AntennaStore.from_geo_dfs({"default": _geo_df(rows)})
+
+    keys = hilbert_keys(store.x, store.y, METROPOLITAN_BOUNDS)
+    assert (np.diff(keys) >= 0).all()
+    assert len(store.x) == 3